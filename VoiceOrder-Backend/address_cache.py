@@ -0,0 +1,97 @@
+#Cache for Google Maps address validation results.
+#In-memory LRU in front of a SQLite table, entries expire after a TTL.
+#Only the fields the delivery check needs are stored, not the full Maps response.
+import json
+import re
+import sqlite3
+import threading
+import time
+
+from lru_cache import LRUCache, MISSING
+
+#Spoken/typed variants -> USPS style abbreviations so "123 Main Street" and "123 main st." share a key
+ABBREVIATIONS = {
+    "street": "st", "avenue": "ave", "road": "rd", "drive": "dr", "lane": "ln",
+    "boulevard": "blvd", "parkway": "pkwy", "court": "ct", "circle": "cir", "place": "pl",
+    "trail": "trl", "highway": "hwy", "apartment": "apt", "suite": "ste",
+    "north": "n", "south": "s", "east": "e", "west": "w",
+    "texas": "tx"
+}
+
+def normalize_address(address_txt:str) -> str:
+    text = str(address_txt).lower().replace("#", " apt ")
+    text = re.sub(r"[^a-z0-9 ]", " ", text)
+    return " ".join(ABBREVIATIONS.get(word, word) for word in text.split())
+
+
+class AddressCache:
+    def __init__(self, db_path:str, ttl_seconds:float=7 * 24 * 3600, memory_size:int=512,
+                 purge_interval:float=3600):
+        self.ttl_seconds = ttl_seconds
+        self.purge_interval = purge_interval #expired rows are deleted at most this often, from put()
+        self._memory = LRUCache(maxsize=memory_size) #key -> (expires_at, record)
+        self._lock = threading.Lock()
+        self._purged_at = 0.0
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS address_cache ("
+            "key TEXT PRIMARY KEY, record TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS address_cache_expires ON address_cache (expires_at)")
+        self._db.commit()
+        self.purge_expired() #rows that expired while the server was down
+
+    #Returns the cached record or None if it's missing/expired
+    def get(self, key:str):
+        now = time.time()
+        entry = self._memory.get(key)
+        if entry is not MISSING:
+            expires_at, record = entry
+            if expires_at > now:
+                return record
+
+        with self._lock:
+            row = self._db.execute(
+                "SELECT record, expires_at FROM address_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[1] <= now:
+            return None
+
+        record = json.loads(row[0])
+        self._memory.put(key, (row[1], record))
+        return record
+
+    def put(self, key:str, record:dict):
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        self._memory.put(key, (expires_at, record))
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO address_cache (key, record, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(record), expires_at)
+            )
+            self._db.commit()
+            # Rows are only replaced when the same address comes back, so expired ones are swept here
+            if now - self._purged_at >= self.purge_interval:
+                self._purge(now)
+
+    #Caller holds _lock
+    def _purge(self, now:float) -> int:
+        cur = self._db.execute("DELETE FROM address_cache WHERE expires_at <= ?", (now,))
+        self._db.commit()
+        self._purged_at = now
+        return cur.rowcount
+
+    #Drops expired rows, returns how many were removed
+    def purge_expired(self) -> int:
+        with self._lock:
+            return self._purge(time.time())
+
+    def clear(self):
+        self._memory.clear()
+        with self._lock:
+            self._db.execute("DELETE FROM address_cache")
+            self._db.commit()
+
+    def stats(self) -> dict:
+        return self._memory.stats()
@@ -0,0 +1,78 @@
+#Micro-benchmark: batched calculate_order vs pricing each cart line with get_price
+#Usage: python benchmarks/bench_pricing.py --lines 30 --runs 200
+import argparse
+import contextlib
+import io
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GOOGLE_MAPS_API_KEY", "AIza-benchmark-placeholder") #tools builds a Maps client at import
+
+import tools
+
+
+#The pre-batching calculate_order: one get_price (match + lookup) per cart line
+def per_line_order(cart_items:dict) -> dict:
+    total_price = 0.0
+    breakdown = []
+    for item_name, details in cart_items.items():
+        qty, style = details[0], details[1]
+        line_price = tools.get_price(item_name, qty, style)
+        total_price += line_price
+        breakdown.append({"item": item_name, "quantity": qty, "line_total": line_price})
+    return {"total_price": total_price, "breakdown": breakdown}
+
+#Catering-style cart: menu names, misheard variants and repeats in different casing
+def make_cart(lines:int, seed:int) -> dict:
+    rng = random.Random(seed)
+    names = tools.menu_store.current.names
+    cart = {}
+    while len(cart) < lines:
+        name = rng.choice(names)
+        roll = rng.random()
+        if roll < 0.3:
+            name = name.replace("a", "e", 1) #ASR style mishearing
+        elif roll < 0.5:
+            name = name.title() #same dish, different casing
+        cart[f"{name}{' ' * rng.randint(0, 2)}"] = [rng.randint(1, 4), rng.choice(["standard", "gravy", "dry", "garlic"]), ""]
+    return cart
+
+def bench(fn, carts:list, cold:bool) -> list:
+    timings = []
+    for cart in carts:
+        if cold:
+            tools.menu_store.current.cache.clear()
+        start = time.perf_counter()
+        fn(cart)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=30)
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    carts = [make_cart(args.lines, seed) for seed in range(args.runs)]
+
+    with contextlib.redirect_stdout(io.StringIO()): #tools logs every match
+        for cart in carts[:5]:
+            assert per_line_order(cart)["total_price"] == tools.calculate_order(cart)["total_price"]
+
+        results = {}
+        for cold in (True, False):
+            for label, fn in (("per_line", per_line_order), ("batched", tools.calculate_order)):
+                results[(label, cold)] = bench(fn, carts, cold)
+
+    print(f"{args.runs} carts x {args.lines} lines (ms per cart)")
+    for cold in (True, False):
+        for label in ("per_line", "batched"):
+            t = results[(label, cold)]
+            print(f"  {'cold' if cold else 'warm'} {label:9s} median={statistics.median(t):.3f}  mean={statistics.mean(t):.3f}  max={max(t):.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+#Load test for the /webhook endpoints: replays Ultravox-style tool calls at a fixed concurrency
+#and reports p50/p95/p99 latency and throughput per tool.
+#
+#   python benchmarks/load_test.py --concurrency 32 --requests 2000
+#   python benchmarks/load_test.py --baseline benchmarks/results/baseline.json   #exit 1 on p95 regressions
+#
+#By default the FastAPI app runs in-process (httpx ASGI transport) with address validation pointed at
+#benchmarks/stub_maps_server.py. Use --url to hit an already running server instead.
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+TOOLS = ("calculate_order", "get_price", "validate_delivery_address", "customer_details")
+STYLES = ("standard", "gravy", "dry", "garlic naan", "butter naan")
+IN_ZONE_ZIPS = ("75034", "75035", "75033", "75093")
+OUT_OF_ZONE_ZIPS = ("75201", "75070", "76051") #dallas, mckinney, grapevine
+STREETS = ("main st", "legacy dr", "preston rd", "coit rd", "eldorado pkwy", "warren pkwy")
+
+
+def _spoken(name:str, rng:random.Random) -> str:
+    roll = rng.random()
+    if roll < 0.2:
+        return name.replace("a", "e", 1) #ASR mishearing
+    if roll < 0.3:
+        return name.title()
+    return name
+
+def _cart(names:list, rng:random.Random, lines:int) -> dict:
+    return {_spoken(rng.choice(names), rng): [rng.randint(1, 3), rng.choice(STYLES), rng.choice(["", "extra spicy", "no onions"])]
+            for _ in range(lines)}
+
+def _address(rng:random.Random, distinct:int) -> str:
+    n = rng.randrange(distinct) #small pool so the address cache sees repeats
+    zip_code = (IN_ZONE_ZIPS + OUT_OF_ZONE_ZIPS)[n % 7] if n % 5 else rng.choice(IN_ZONE_ZIPS)
+    return f"{100 + n} {STREETS[n % len(STREETS)]}, tx {zip_code}"
+
+#Mix of tool calls roughly matching a real order conversation
+def build_payloads(count:int, seed:int, distinct_addresses:int) -> list:
+    from tools import menu_store
+    names = sorted(menu_store.current.names)
+    rng = random.Random(seed)
+    payloads = []
+    for _ in range(count):
+        tool = rng.choices(TOOLS, weights=(4, 2, 2, 1))[0]
+        if tool == "calculate_order":
+            body = {"cart_items": _cart(names, rng, rng.randint(1, 8))}
+        elif tool == "get_price":
+            body = {"item_name": _spoken(rng.choice(names), rng), "quantity": rng.randint(1, 4), "dish_type": rng.choice(STYLES)}
+        elif tool == "validate_delivery_address":
+            body = {"address_txt": _address(rng, distinct_addresses)}
+        else:
+            body = {
+                "first_name": rng.choice(["priya", "john", "anil", "maria"]),
+                "last_name": rng.choice(["reddy", "smith", "kumar", "garcia"]),
+                "phone": f"214555{rng.randint(0, 9999):04d}",
+                "address": _address(rng, distinct_addresses),
+                "cart_items": _cart(names, rng, rng.randint(1, 5))
+            }
+        payloads.append((tool, body))
+    return payloads
+
+#Nearest-rank percentile: smallest value with at least pct% of the samples at or below it
+def percentile(sorted_values:list, pct:float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+async def run_load(client:httpx.AsyncClient, payloads:list, concurrency:int) -> tuple:
+    samples = {tool: [] for tool in TOOLS}
+    errors = {tool: 0 for tool in TOOLS}
+    queue = asyncio.Queue()
+    for item in payloads:
+        queue.put_nowait(item)
+
+    async def worker():
+        while True:
+            try:
+                tool, body = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            start = time.perf_counter()
+            try:
+                resp = await client.post(f"/webhook/{tool}", json=body)
+                data = resp.json()
+                ok = resp.status_code == 200 and not (isinstance(data, dict) and "error" in data)
+            except httpx.HTTPError:
+                ok = False
+            samples[tool].append((time.perf_counter() - start) * 1000)
+            if not ok:
+                errors[tool] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples, errors, time.perf_counter() - start
+
+def summarize(samples:dict, errors:dict, elapsed:float, args) -> dict:
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "concurrency": args.concurrency,
+        "requests": sum(len(v) for v in samples.values()),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(sum(len(v) for v in samples.values()) / elapsed, 1) if elapsed else 0.0,
+        "maps_latency_ms": args.maps_latency * 1000,
+        "tools": {}
+    }
+    for tool, values in samples.items():
+        values = sorted(values)
+        report["tools"][tool] = {
+            "count": len(values),
+            "errors": errors[tool],
+            "p50_ms": round(percentile(values, 50), 3),
+            "p95_ms": round(percentile(values, 95), 3),
+            "p99_ms": round(percentile(values, 99), 3),
+            "max_ms": round(values[-1], 3) if values else 0.0,
+            "throughput_rps": round(len(values) / elapsed, 1) if elapsed else 0.0
+        }
+    return report
+
+def print_report(report:dict):
+    print(f"{report['requests']} requests @ concurrency {report['concurrency']} in {report['elapsed_s']}s "
+          f"({report['throughput_rps']} req/s)")
+    print(f"  {'tool':28s} {'count':>6s} {'err':>4s} {'p50':>9s} {'p95':>9s} {'p99':>9s} {'req/s':>8s}")
+    for tool, r in report["tools"].items():
+        print(f"  {tool:28s} {r['count']:6d} {r['errors']:4d} {r['p50_ms']:9.3f} {r['p95_ms']:9.3f} {r['p99_ms']:9.3f} {r['throughput_rps']:8.1f}")
+
+#Returns the tools whose p95 got worse than the baseline by more than `tolerance` (0.2 = 20%)
+def find_regressions(report:dict, baseline:dict, tolerance:float) -> list:
+    regressions = []
+    for tool, r in report["tools"].items():
+        base = baseline.get("tools", {}).get(tool)
+        if not base or not base.get("p95_ms") or not r["count"]:
+            continue
+        if r["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{tool}: p95 {base['p95_ms']}ms -> {r['p95_ms']}ms")
+    return regressions
+
+async def main_async(args) -> dict:
+    # Throwaway caches/order store so runs don't affect each other (payloads are built from tools' menu)
+    workdir = tempfile.mkdtemp(prefix="voiceorder-bench-")
+    os.environ.setdefault("GOOGLE_MAPS_API_KEY", "AIza-benchmark-placeholder")
+    os.environ["ADDRESS_CACHE_PATH"] = os.path.join(workdir, "address_cache.sqlite3")
+    os.environ["ORDER_DB_PATH"] = os.path.join(workdir, "orders.sqlite3")
+    os.environ["ORDER_JOURNAL_PATH"] = os.path.join(workdir, "orders.journal")
+
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=30)
+        payloads = build_payloads(args.requests, args.seed, args.distinct_addresses)
+        async with client:
+            samples, errors, elapsed = await run_load(client, payloads, args.concurrency)
+        return summarize(samples, errors, elapsed, args)
+
+    import contextlib
+    import io
+    from stub_maps_server import start_stub_server, StubMapsClient
+    import main
+    import tools
+
+    stub = start_stub_server(latency=args.maps_latency)
+    tools.set_maps_client(StubMapsClient(f"http://127.0.0.1:{stub.server_address[1]}"))
+    payloads = build_payloads(args.requests, args.seed, args.distinct_addresses)
+
+    transport = httpx.ASGITransport(app=main.app)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()): #tools prints per call
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=30) as client:
+                samples, errors, elapsed = await run_load(client, payloads, args.concurrency)
+    finally:
+        stub.shutdown()
+        tools.order_store.close()
+    return summarize(samples, errors, elapsed, args)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--maps-latency", type=float, default=0.08, help="stub Maps response time in seconds")
+    parser.add_argument("--distinct-addresses", type=int, default=200)
+    parser.add_argument("--url", help="benchmark a running server instead of the in-process app")
+    parser.add_argument("--out", help="results JSON path (default: benchmarks/results/load_<timestamp>.json)")
+    parser.add_argument("--baseline", help="previous results JSON to compare p95 latencies against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p95 slowdown vs baseline")
+    args = parser.parse_args()
+
+    report = asyncio.run(main_async(args))
+    print_report(report)
+
+    out = args.out or os.path.join(BENCH_DIR, "results", f"load_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {out}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = find_regressions(report, json.load(f), args.tolerance)
+        if regressions:
+            print("REGRESSIONS:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print("No p95 regressions against baseline")
+
+if __name__ == "__main__":
+    main()
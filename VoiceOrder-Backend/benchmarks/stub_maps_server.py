@@ -0,0 +1,83 @@
+#Local stand-in for the Google Maps Address Validation endpoint, used by the load test.
+#Serves POST /v1:validateAddress with canned responses so benchmarks never hit (or pay for) Google.
+#Run standalone: python benchmarks/stub_maps_server.py --port 8765 --latency 0.08
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from delivery_zones import parse_zip
+from fake_maps import validation_response, UNKNOWN_ADDRESS
+
+
+#Addresses ending in a zip are "found" at that zip, everything else is unknown
+def canned_response(address_txt:str) -> dict:
+    zip_code = parse_zip(address_txt)
+    if zip_code is None:
+        return UNKNOWN_ADDRESS
+    city = "frisco" if zip_code in ("75033", "75034", "75035") else "plano" if zip_code == "75093" else "dallas"
+    return validation_response(address_txt.title(), zip_code, city)
+
+
+def make_handler(latency:float):
+    class StubMapsHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)) or 0)
+            try:
+                lines = json.loads(body)["address"]["addressLines"]
+            except (ValueError, KeyError, TypeError):
+                self.send_error(400)
+                return
+            if latency:
+                time.sleep(latency)
+            payload = json.dumps(canned_response(" ".join(lines))).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    return StubMapsHandler
+
+#Starts the stub on a daemon thread, returns the server (server.server_address has the port)
+def start_stub_server(port:int=0, latency:float=0.0) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(latency))
+    threading.Thread(target=server.serve_forever, name="stub-maps", daemon=True).start()
+    return server
+
+
+#Drop-in for googlemaps.Client.addressvalidation that talks to the stub over HTTP
+class StubMapsClient:
+    def __init__(self, base_url:str):
+        self.url = f"{base_url}/v1:validateAddress"
+        self._local = threading.local() #one keep-alive session per worker thread
+
+    def addressvalidation(self, addressLines, regionCode=None, locality=None, enableUspsCass=None):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        resp = session.post(self.url, json={"address": {"addressLines": addressLines}, "enableUspsCass": enableUspsCass})
+        return resp.json()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.08, help="seconds per response")
+    args = parser.parse_args()
+    server = start_stub_server(args.port, args.latency)
+    print(f"Stub Maps server on http://127.0.0.1:{server.server_address[1]}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,116 @@
+#Delivery zone table + offline precheck of spoken addresses.
+#The precheck only rejects addresses that are clearly outside the zone: a zip we don't serve whose
+#city is known (zip_cities) and isn't serviceable either. Anything plausible, unknown or unparseable
+#still goes to Google Maps.
+#
+#delivery_zones.json:
+#   zips                serviceable 5 digit zips
+#   cities              serviceable city names (lowercase)
+#   zip_cities          zip -> USPS city (lowercase) for zips the precheck may decide on its own
+#   areas               optional extra areas, matched against zip centroids:
+#                         {"name": "...", "center": [lat, lng], "radius_km": 10}
+#                         {"name": "...", "polygon": [[lat, lng], [lat, lng], ...]}
+#   zip_centroids_file  optional local geodata file {"75034": [lat, lng], ...}, relative to the zone file
+import json
+import math
+import os
+import re
+
+IN_ZONE = "in_zone"
+OUT_OF_ZONE = "out_of_zone"
+UNKNOWN = "unknown"
+
+ZIP_RE = re.compile(r"\b(\d{5})(?:-\d{4})?\b")
+
+
+def _haversine_km(a:tuple, b:tuple) -> float:
+    lat1, lng1, lat2, lng2 = map(math.radians, (a[0], a[1], b[0], b[1]))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * 6371.0 * math.asin(math.sqrt(h))
+
+#Ray casting point-in-polygon, polygon is a list of [lat, lng]
+def _in_polygon(point:tuple, polygon:list) -> bool:
+    lat, lng = point
+    inside = False
+    j = len(polygon) - 1
+    for i in range(len(polygon)):
+        lat_i, lng_i = polygon[i]
+        lat_j, lng_j = polygon[j]
+        if (lng_i > lng) != (lng_j > lng):
+            cross = (lat_j - lat_i) * (lng - lng_i) / (lng_j - lng_i) + lat_i
+            if lat < cross:
+                inside = not inside
+        j = i
+    return inside
+
+#Zip from spoken address text. Ignores the first token, which is usually a (sometimes 5 digit) house number
+def parse_zip(address_txt:str):
+    text = str(address_txt)
+    first_token_end = len(text) - len(text.lstrip()) + len((text.split() or [""])[0])
+    matches = [m.group(1) for m in ZIP_RE.finditer(text) if m.start() >= first_token_end]
+    return matches[-1] if matches else None
+
+
+class ZoneTable:
+    def __init__(self, zips, cities, areas=None, zip_centroids=None, zip_cities=None):
+        self.zips = set(zips)
+        self.cities = {c.lower() for c in cities}
+        self.zip_cities = {z: c.lower() for z, c in (zip_cities or {}).items()}
+        self.areas = list(areas or [])
+        self.zip_centroids = dict(zip_centroids or {})
+        self._city_patterns = [(city, re.compile(rf"\b{re.escape(city)}\b")) for city in self.cities]
+
+    @classmethod
+    def from_file(cls, path:str) -> "ZoneTable":
+        with open(path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+
+        zip_centroids = {}
+        centroids_file = config.get("zip_centroids_file")
+        if centroids_file:
+            centroids_path = os.path.join(os.path.dirname(os.path.abspath(path)), centroids_file)
+            with open(centroids_path, 'r', encoding='utf-8') as f:
+                zip_centroids = {z: tuple(p) for z, p in json.load(f).items()}
+
+        return cls(
+            config.get("zips", []), config.get("cities", []), config.get("areas", []),
+            zip_centroids, config.get("zip_cities", {})
+        )
+
+    def _zip_in_areas(self, zip_code:str) -> bool:
+        point = self.zip_centroids.get(zip_code)
+        if point is None:
+            return False
+        for area in self.areas:
+            if "polygon" in area and _in_polygon(point, area["polygon"]):
+                return True
+            if "center" in area and _haversine_km(point, tuple(area["center"])) <= area.get("radius_km", 0):
+                return True
+        return False
+
+    def zip_serviceable(self, zip_code:str) -> bool:
+        return zip_code in self.zips or self._zip_in_areas(zip_code)
+
+    #Final check on the standardized address Maps returns
+    def is_serviceable(self, zip_code:str, city:str) -> bool:
+        return self.zip_serviceable(zip_code) or (city or "").lower() in self.cities
+
+    #Cheap check on the raw spoken text before paying for a Maps call
+    def precheck(self, address_txt:str) -> str:
+        text = str(address_txt).lower()
+        if any(pattern.search(text) for _, pattern in self._city_patterns):
+            return IN_ZONE
+
+        zip_code = parse_zip(text)
+        if zip_code is None:
+            return UNKNOWN
+        if self.zip_serviceable(zip_code):
+            return IN_ZONE
+
+        # Maps may still place an unlisted zip in a serviceable city, only reject when we know it won't
+        known_city = self.zip_cities.get(zip_code)
+        if known_city is not None:
+            return IN_ZONE if known_city in self.cities else OUT_OF_ZONE
+        if self.cities or (self.areas and zip_code not in self.zip_centroids):
+            return UNKNOWN
+        return OUT_OF_ZONE
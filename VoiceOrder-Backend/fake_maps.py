@@ -0,0 +1,51 @@
+#Stand-in for googlemaps.Client that returns canned Address Validation responses.
+#Lets tests and benchmarks exercise validate_delivery_address without an API key or network.
+import threading
+import time
+
+from address_cache import normalize_address
+
+
+#Builds a response shaped like the parts of the Address Validation API that tools.py reads
+def validation_response(formatted_address:str, zip_code:str, city:str, dpv:str="Y",
+                        granularity:str="PREMISE", next_action:str="ACCEPT") -> dict:
+    return {
+        "result": {
+            "verdict": {
+                "validationGranularity": granularity,
+                "possibleNextAction": next_action
+            },
+            "address": {"formattedAddress": formatted_address},
+            "uspsData": {
+                "dpvConfirmation": dpv,
+                "standardizedAddress": {"zipCode": zip_code, "city": city.upper()}
+            }
+        }
+    }
+
+#Returned for addresses the fake doesn't know about
+UNKNOWN_ADDRESS = {
+    "result": {
+        "verdict": {"validationGranularity": "ROUTE", "possibleNextAction": "FIX"},
+        "uspsData": {"dpvConfirmation": "N"}
+    }
+}
+
+
+class FakeMapsClient:
+    def __init__(self, responses:dict=None, latency:float=0.0):
+        # address text -> response, keys are normalized the same way the cache does
+        self.responses = {normalize_address(k): v for k, v in (responses or {}).items()}
+        self.latency = latency #seconds, to mimic the Maps round trip
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def add(self, address_txt:str, response:dict):
+        self.responses[normalize_address(address_txt)] = response
+
+    def addressvalidation(self, addressLines, regionCode=None, locality=None, enableUspsCass=None):
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return self.responses.get(normalize_address(" ".join(addressLines)), UNKNOWN_ADDRESS)
@@ -1,65 +1,117 @@
 from fastapi import FastAPI, Request
-from pydantic import BaseModel
-import asyncio
+from pydantic import BaseModel, ValidationError
 import json
+import logging
+import os
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
 from dotenv import load_dotenv
 
-from tools import calculate_order, validate_delivery_address, customer_details, get_price
+from tools import get_price, menu_registry, order_store
+from menu_registry import MenuLoadError, UnknownRestaurantError
+from tool_executor import ToolExecutor
+from tool_registry import get_tool, concurrency_limits, infer_tool_name
 
 # Load environment variables
 load_dotenv()
-app = FastAPI()
+
+# Own handler: uvicorn only configures its own loggers, so INFO records here would otherwise be dropped
+logger = logging.getLogger("voiceorder.webhook")
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+LOG_SAMPLE_RATE = float(os.getenv("WEBHOOK_LOG_SAMPLE_RATE", "0.1")) #share of successful calls logged, errors always are
+
+# Blocking tools (Maps HTTP call, order write, cold menu load) run on a bounded thread pool, pricing stays inline
+executor = ToolExecutor(
+    max_workers=int(os.getenv("TOOL_MAX_WORKERS", "16")),
+    limits=concurrency_limits()
+)
+
+#Menu watcher runs for the lifetime of the server so menu edits are picked up live
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    menu_registry.start()
+    yield
+    menu_registry.stop()
+    executor.shutdown()
+    order_store.close() #drains queued orders into SQLite
+
+app = FastAPI(lifespan=lifespan)
+
+#One compact JSON line per call: tool, outcome, latency and the argument keys (never the values)
+def log_call(tool_name, status:str, started:float, payload:dict):
+    if status == "ok" and random.random() >= LOG_SAMPLE_RATE:
+        return
+    logger.log(logging.INFO if status == "ok" else logging.WARNING, json.dumps({
+        "event": "tool_call",
+        "tool": tool_name,
+        "status": status,
+        "ms": round((time.perf_counter() - started) * 1000, 2),
+        "arg_keys": sorted(payload) if isinstance(payload, dict) else None
+    }))
+
+async def dispatch_tool(tool_name: Optional[str], payload: dict, restaurant_id: Optional[str] = None):
+    started = time.perf_counter()
+    spec = get_tool(tool_name) if tool_name else None
+    if spec is None:
+        log_call(tool_name, "unknown_tool", started, payload)
+        return {"error": f"Unknown tool: {tool_name}" if tool_name else "Could not identify tool from arguments"}
+
+    # X-Restaurant-Id header picks the menu unless the payload names one itself
+    if restaurant_id and spec.per_restaurant and isinstance(payload, dict) and not payload.get("restaurant_id"):
+        payload = {**payload, "restaurant_id": restaurant_id}
+
+    try:
+        args = spec.parse(payload)
+    except ValidationError as e:
+        log_call(tool_name, "invalid_args", started, payload)
+        return {"error": f"Invalid arguments for {tool_name}", "details": e.errors(include_url=False, include_input=False)}
+
+    try:
+        # Pricing is inline only when the menu is already in memory, a cold or evicted menu loads on the pool
+        offload = spec.offload or (spec.per_restaurant and not menu_registry.is_loaded(args.get("restaurant_id")))
+        result = await executor.run(spec.name, spec.handler, offload=offload, **args)
+    except UnknownRestaurantError as e:
+        log_call(tool_name, "unknown_restaurant", started, payload)
+        return {"error": f"Unknown restaurant: {e.args[0]}"}
+    except MenuLoadError as e:
+        log_call(tool_name, "menu_error", started, payload)
+        return {"error": f"The menu for {e.args[0]} is unavailable right now"}
+    log_call(tool_name, "ok", started, payload)
+    return result
 
 class PriceRequest(BaseModel):
     item_name: str
     quantity: int
+    dish_type: str = "standard"
+    restaurant_id: Optional[str] = None
     
 @app.post("/price")
 async def price(request: PriceRequest):
     print(f"Calculating price for {request.quantity} * {request.item_name}")
-    price = tools.get_price(request.item_name, request.quantity)
+    try:
+        price = await executor.run("get_price", get_price, request.item_name, request.quantity, request.dish_type, request.restaurant_id, offload=not menu_registry.is_loaded(request.restaurant_id))
+    except UnknownRestaurantError:
+        return {"error": f"Unknown restaurant: {request.restaurant_id}"}
+    except MenuLoadError:
+        return {"error": f"The menu for {request.restaurant_id} is unavailable right now"}
     return {"price": price}
 
-@app.post("/webhook")
-async def ultravox_conection(request: Request):
+#Preferred: each Ultravox tool points at its own URL, ex: /webhook/calculate_order
+@app.post("/webhook/{tool_name}")
+async def ultravox_tool(tool_name: str, request: Request):
     data = await request.json()
-    print(f"Incoming Webhook Data: {json.dumps(data, indent=2)}")
-    
-    # Infer tool based on payload keys
-    if "cart_items" in data and "first_name" not in data:
-        print("Detected Tool: calculate_order")
-        return calculate_order(data.get("cart_items"))
-        
-    elif "address_txt" in data:
-        print("Detected Tool: validate_delivery_address")
-        return validate_delivery_address(data.get("address_txt"))
-    
-    elif "first_name" in data and "cart_items" in data:
-        print("Detected Tool: customer_details")
-        return customer_details(
-            data.get("first_name"),
-            data.get("last_name"),
-            data.get("phone"),
-            data.get("address"),
-            data.get("cart_items")
-        )
-    
-    elif "item_name" in data and "quantity" in data:
-        print("Detected Tool: get_price")
-        return get_price(
-            data.get("item_name"),
-            data.get("quantity"),
-            data.get("dish_type", "standard")
-        )
-
-    print("Error: Unknown Tool signature")
-    return {"error": "Could not identify tool from arguments"}
-
-    print("Error: Unknown Tool signature")
-    return {"error": "Could not identify tool from arguments"}
+    return await dispatch_tool(tool_name, data, request.headers.get("x-restaurant-id"))
 
+#Legacy single endpoint. Uses the X-Tool-Name header, or infers the tool from the payload keys for old agent configs
 @app.post("/webhook")
 async def ultravox_conection(request: Request):
     data = await request.json()
-    print(f"Incoming Webhook Data: {json.dumps(data, indent=2)}")
-    return dispatch_tool(data)
\ No newline at end of file
+    tool_name = request.headers.get("x-tool-name") or infer_tool_name(data)
+    return await dispatch_tool(tool_name, data, request.headers.get("x-restaurant-id"))
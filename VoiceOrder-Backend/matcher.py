@@ -0,0 +1,137 @@
+#Fuzzy matcher for spoken menu item names.
+#Lookups go: exact match -> phonetic key -> trigram prefilter -> full scoring of a few candidates.
+#The full candidate list is only scored when the shortlist has no confident match.
+from collections import defaultdict
+
+from rapidfuzz import fuzz, process, utils
+
+try:
+    import numpy #rapidfuzz.process.cdist returns a numpy matrix
+except ImportError:
+    numpy = None
+
+PHONETIC_SCORE = 90 #reported for phonetic index hits, above the default confidence threshold
+
+
+#Default scoring backend, rapidfuzz's C implementation of WRatio (same scorer thefuzz uses)
+class RapidFuzzScorer:
+    def __init__(self, scorer=fuzz.WRatio, workers:int=1):
+        self.scorer = scorer
+        self.workers = workers #threads for cdist, -1 = all cores
+
+    #Returns (best_choice, score) for one query, or (None, 0) if there are no choices
+    def best(self, query:str, choices:list) -> tuple:
+        if not choices:
+            return None, 0
+        choice, score, _ = process.extractOne(query, choices, scorer=self.scorer, processor=None)
+        return choice, int(round(score))
+
+    #Scores many queries against the same choices. With numpy installed this is one
+    #process.cdist call (C loop, GIL released, score matrix), otherwise one extractOne per query
+    def best_many(self, queries:list, choices:list) -> list:
+        if not choices:
+            return [(None, 0)] * len(queries)
+        if numpy is None or len(queries) < 2:
+            return [self.best(query, choices) for query in queries]
+        scores = process.cdist(queries, choices, scorer=self.scorer, processor=None, dtype=numpy.float64, workers=self.workers)
+        best = scores.argmax(axis=1) #first highest score, same tie-break as extractOne
+        return [(choices[j], int(round(float(scores[i, j])))) for i, j in enumerate(best)]
+
+def _trigrams(text:str) -> set:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class MenuMatcher:
+    def __init__(self, names, scorer=None, threshold:int=80, max_candidates:int=8, phonetic=None):
+        self.scorer = scorer or RapidFuzzScorer()
+        self.phonetic = phonetic #optional phonetic.PhoneticIndex, consulted before fuzzy scoring
+        self.threshold = threshold
+        self.max_candidates = max_candidates
+
+        # processed form -> original name, first one wins (drops duplicate names/variations)
+        self._by_processed = {}
+        for name in names:
+            if not name:
+                continue
+            processed = utils.default_process(name)
+            if processed and processed not in self._by_processed:
+                self._by_processed[processed] = name
+        self.candidates = list(self._by_processed)
+
+        # trigram -> ids of candidates containing it
+        self._grams = defaultdict(list)
+        for idx, candidate in enumerate(self.candidates):
+            for gram in _trigrams(candidate):
+                self._grams[gram].append(idx)
+
+    def __len__(self):
+        return len(self.candidates)
+
+    @property
+    def names(self) -> list:
+        return list(self._by_processed.values())
+
+    #Top candidates by number of shared trigrams with the query
+    def shortlist(self, processed:str) -> list:
+        counts = defaultdict(int)
+        for gram in _trigrams(processed):
+            for idx in self._grams.get(gram, ()):
+                counts[idx] += 1
+        top = sorted(counts, key=counts.__getitem__, reverse=True)[:self.max_candidates]
+        # Back to menu order so score ties resolve to the earlier item, like a full scan
+        return [self.candidates[idx] for idx in sorted(top)]
+
+    #Returns (best_name, score), score is 0-100 like thefuzz
+    def match(self, query:str) -> tuple:
+        processed = utils.default_process(query)
+        if not processed:
+            return None, 0
+
+        exact = self._by_processed.get(processed)
+        if exact is not None:
+            return exact, 100
+
+        sounds_like = self.phonetic.lookup(processed) if self.phonetic else None
+        if sounds_like is not None:
+            return sounds_like, PHONETIC_SCORE
+
+        best, score = self.scorer.best(processed, self.shortlist(processed))
+        if score < self.threshold:
+            # Nothing confident in the shortlist, fall back to scoring every candidate
+            best, score = self.scorer.best(processed, self.candidates)
+        if best is None:
+            return None, 0
+        return self._by_processed[best], score
+
+    #match() for a batch of queries, the full-scan fallbacks go to the backend together
+    def match_many(self, queries:list) -> list:
+        results = [None] * len(queries)
+        fallback = []
+        for i, query in enumerate(queries):
+            processed = utils.default_process(query)
+            if not processed:
+                results[i] = (None, 0)
+                continue
+
+            exact = self._by_processed.get(processed)
+            if exact is not None:
+                results[i] = (exact, 100)
+                continue
+
+            sounds_like = self.phonetic.lookup(processed) if self.phonetic else None
+            if sounds_like is not None:
+                results[i] = (sounds_like, PHONETIC_SCORE)
+                continue
+
+            best, score = self.scorer.best(processed, self.shortlist(processed))
+            if score < self.threshold:
+                fallback.append((i, processed))
+            else:
+                results[i] = (self._by_processed[best], score)
+
+        if fallback:
+            scored = self.scorer.best_many([p for _, p in fallback], self.candidates)
+            for (i, _), (best, score) in zip(fallback, scored):
+                results[i] = (self._by_processed[best], score) if best is not None else (None, 0)
+        return results
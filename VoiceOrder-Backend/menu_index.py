@@ -0,0 +1,89 @@
+#Precompiled lookup table for the menu, built once when the menu is loaded.
+#Every item name and voice variation maps straight to a resolved pricing record,
+#so get_price no longer walks the sections or parses "$x.xx" strings per call.
+from menu_model import PriceRecord, intern_name
+
+
+#Func to convert "$5.99" to 5.99
+def parse_price(price_str:str) -> float:
+    if not price_str: return 0.0
+
+    # removing '$' and take first part if there's extra text
+    clean_str = price_str.replace("$","").split()[0]
+    try:
+        return float(clean_str)
+    except ValueError:
+        return 0.0
+
+#Lowercase + collapse whitespace, used for both index keys and lookups
+def normalize_name(name:str) -> str:
+    return " ".join(str(name).lower().split())
+
+#Same as parse_price but never raises on malformed menu values (ex: numbers instead of "$x.xx")
+def _safe_parse(price_data) -> float:
+    try:
+        return parse_price(price_data)
+    except (TypeError, AttributeError):
+        return 0.0
+
+def build_price_record(item:dict, section:str="") -> PriceRecord:
+    price_data = item.get("price")
+
+    options = item.get("price_options") or {}
+    price_options = ()
+    if isinstance(options, dict):
+        price_options = tuple((intern_name(str(k).lower()), _safe_parse(v)) for k, v in options.items())
+
+    # Ex: naan -> (("plain naan", 1.99), ("butter naan", 2.49), ...)
+    variations = []
+    for var in item.get("variations") or []:
+        if isinstance(var, dict):
+            variations.append((str(var.get("type", "")).lower(), _safe_parse(var.get("price"))))
+
+    return PriceRecord(
+        name=intern_name(str(item.get("name", "")).lower()),
+        section=intern_name(section),
+        price=_safe_parse(price_data) if price_data else None,
+        price_options=price_options,
+        variations=tuple(variations)
+    )
+
+#Returns the unit price for the given style or None if the style can't be priced
+def resolve_unit_price(record:PriceRecord, item_type:str):
+    if record.price is not None:
+        return record.price
+
+    # Gravy/dry style pricing
+    for option, option_price in record.price_options:
+        if option == item_type:
+            return option_price
+
+    # Check for variations (e.g. Naan methods)
+    if item_type:
+        for var_type, var_price in record.variations:
+            if item_type in var_type:
+                return var_price
+    return None
+
+def build_menu_index(menu_data:dict) -> dict:
+    # {normalized name or voice variation: pricing record}
+    # First item to claim a name wins, same as the old top-to-bottom menu scan
+    index = {}
+    full_menu = menu_data.get("menu", {})
+
+    for sections, items in full_menu.items():
+        if not isinstance(items, list):
+            continue
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            record = build_price_record(item, sections)
+
+            name = item.get("name")
+            if isinstance(name, str) and name:
+                index.setdefault(intern_name(normalize_name(name)), record)
+
+            for v in item.get("voice_variations", []) or []:
+                if isinstance(v, str) and v:
+                    index.setdefault(intern_name(normalize_name(v)), record)
+    return index
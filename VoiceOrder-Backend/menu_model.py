@@ -0,0 +1,18 @@
+#Compact in-memory menu. Only the pricing fields live in memory per item (slotted records with
+#pre-parsed floats), descriptions/pronunciations/common_questions are not kept after the menu is built.
+import sys
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass(frozen=True, slots=True)
+class PriceRecord:
+    name: str
+    section: str
+    price: Optional[float]           #flat price, None if the item is priced by style
+    price_options: tuple = ()        #(("gravy", 11.99), ("dry", 12.99))
+    variations: tuple = ()           #(("plain naan", 1.99), ("butter naan", 2.49), ...)
+
+
+def intern_name(name:str) -> str:
+    return sys.intern(name)
@@ -0,0 +1,176 @@
+#Serves many restaurants' menus from one process.
+#Each restaurant id maps to its own MenuStore (name index, price records, resolution cache), loaded
+#from MENUS_DIR/<restaurant_id>.json on first use. Least recently used menus are evicted once the
+#loaded menus go over the memory budget. The default restaurant (latestMenu.json) is never evicted.
+#One watcher thread polls every loaded menu file for edits.
+import os
+import re
+import sys
+import threading
+from collections import OrderedDict
+
+from menu_store import MENU_ERRORS, MenuStore
+
+RESTAURANT_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$") #also keeps ids from escaping MENUS_DIR
+
+
+class UnknownRestaurantError(KeyError):
+    pass
+
+
+#The restaurant's menu file exists but can't be read or parsed
+class MenuLoadError(Exception):
+    pass
+
+
+#Rough deep size of a snapshot (dicts, tuples, slotted records, strings), good enough for budgeting
+def estimate_size(obj, _seen=None) -> int:
+    seen = _seen if _seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(estimate_size(k, seen) + estimate_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(v, seen) for v in obj)
+    elif hasattr(obj, "__slots__"):
+        size += sum(estimate_size(getattr(obj, s), seen) for s in obj.__slots__ if hasattr(obj, s))
+    elif hasattr(obj, "__dict__"):
+        size += estimate_size(vars(obj), seen)
+    return size
+
+#One resolution cache entry: (spoken name, style) -> (menu name, price), plus the OrderedDict link
+_CACHE_ENTRY_BYTES = estimate_size((("chicken tikka masala", "standard"), ("chicken tikka masala", 15.99))) + 100
+
+#Index, matcher, phonetic keys and the resolution cache. The cache starts empty and fills up as
+#calls come in, so it's counted at its full maxsize to keep the budget honest
+def snapshot_size(snapshot) -> int:
+    size = estimate_size((
+        snapshot.index, snapshot.matcher.candidates, snapshot.matcher._by_processed, snapshot.matcher._grams,
+        snapshot.phonetic
+    ))
+    return size + sys.getsizeof(snapshot.cache._data) + snapshot.cache.maxsize * _CACHE_ENTRY_BYTES
+
+
+class MenuRegistry:
+    def __init__(self, menus_dir:str, default_id:str, default_path:str, memory_budget:int=256 * 1024 * 1024,
+                 poll_interval:float=2.0, cache_size:int=1024):
+        self.menus_dir = menus_dir
+        self.default_id = default_id
+        self.default_path = default_path
+        self.memory_budget = memory_budget #bytes
+        self.poll_interval = poll_interval
+        self.cache_size = cache_size
+
+        self._stores = OrderedDict() #restaurant id -> MenuStore, most recently used last
+        self._sizes = {}
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self._stop = threading.Event()
+        self._thread = None
+        self.loads = 0
+        self.evictions = 0
+
+        self.get(default_id) #default menu loads eagerly, same as before
+
+    def _path_for(self, restaurant_id:str) -> str:
+        if restaurant_id == self.default_id:
+            return self.default_path
+        return os.path.join(self.menus_dir, f"{restaurant_id}.json")
+
+    def get(self, restaurant_id:str=None) -> MenuStore:
+        restaurant_id = restaurant_id or self.default_id
+        with self._lock:
+            store = self._stores.get(restaurant_id)
+            if store is not None:
+                self._stores.move_to_end(restaurant_id)
+                return store
+            if not RESTAURANT_ID_RE.match(restaurant_id):
+                raise UnknownRestaurantError(restaurant_id)
+            load_lock = self._load_locks.setdefault(restaurant_id, threading.Lock())
+
+        # Only one thread builds a given menu, others for the same id wait for it
+        try:
+            with load_lock:
+                with self._lock:
+                    store = self._stores.get(restaurant_id)
+                if store is not None:
+                    return store
+
+                path = self._path_for(restaurant_id)
+                if not os.path.isfile(path):
+                    raise UnknownRestaurantError(restaurant_id)
+                try:
+                    store = MenuStore(path, cache_size=self.cache_size)
+                except MENU_ERRORS as e:
+                    print(f"Menu for {restaurant_id} could not be loaded: {e}")
+                    raise MenuLoadError(restaurant_id) from e
+                size = snapshot_size(store.current)
+                print(f"Loaded menu for {restaurant_id} (~{size // 1024} KB)")
+
+                with self._lock:
+                    self._stores[restaurant_id] = store
+                    self._sizes[restaurant_id] = size
+                    self.loads += 1
+                    self._evict_over_budget(keep=restaurant_id)
+                return store
+        finally:
+            # Dropped on failure too, so unknown or broken ids don't leave a lock behind
+            with self._lock:
+                if self._load_locks.get(restaurant_id) is load_lock:
+                    del self._load_locks[restaurant_id]
+
+    #Caller holds _lock. Requests already holding an evicted snapshot keep using it until they finish
+    def _evict_over_budget(self, keep:str):
+        for restaurant_id in list(self._stores):
+            if sum(self._sizes.values()) <= self.memory_budget:
+                break
+            if restaurant_id in (keep, self.default_id):
+                continue
+            del self._stores[restaurant_id]
+            self._sizes.pop(restaurant_id, None)
+            self.evictions += 1
+            print(f"Evicted menu for {restaurant_id} (memory budget)")
+
+    #True if the menu is in memory, so get() won't read or build anything
+    def is_loaded(self, restaurant_id:str=None) -> bool:
+        with self._lock:
+            return (restaurant_id or self.default_id) in self._stores
+
+    def loaded(self) -> list:
+        with self._lock:
+            return list(self._stores)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "loaded": len(self._stores),
+                "approx_bytes": sum(self._sizes.values()),
+                "memory_budget": self.memory_budget,
+                "loads": self.loads,
+                "evictions": self.evictions
+            }
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            with self._lock:
+                stores = list(self._stores.items())
+            for restaurant_id, store in stores:
+                if store.reload_if_changed():
+                    with self._lock:
+                        if restaurant_id in self._sizes:
+                            self._sizes[restaurant_id] = snapshot_size(store.current)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="menu-registry-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.poll_interval + 1)
+            self._thread = None
@@ -0,0 +1,99 @@
+#Hot-reloadable menu. MenuRegistry's watcher calls reload_if_changed(), which builds a complete
+#new snapshot (index, matcher, cache) before swapping it in when the file changed.
+#Requests grab `store.current` once and keep using that snapshot, so they never see a half-built menu.
+import json
+import os
+import threading
+
+from menu_index import build_menu_index
+from matcher import MenuMatcher
+from lru_cache import LRUCache
+from phonetic import PhoneticIndex
+
+
+#Everything a request needs to price items. The raw JSON isn't kept: pricing lives in slotted
+#PriceRecords in the index, descriptive text isn't used by any tool and is dropped
+class MenuSnapshot:
+    def __init__(self, menu_data:dict, version:tuple, cache_size:int=1024):
+        self.version = version #(mtime_ns, size) of the file this was built from
+
+        all_valid_names = []
+        for sections, items in menu_data.get("menu", {}).items():
+            if isinstance(items, list):
+                for item in items:
+                    name = item.get("name")
+                    if name:
+                        all_valid_names.append(name.lower())
+
+                    variations = item.get("voice_variations", [])
+                    all_valid_names.extend([v.lower() for v in variations if v])
+
+        # Name/variation -> pricing record, built once so lookups skip the menu scan
+        self.index = build_menu_index(menu_data)
+
+        # Sound-alike keys over names, variations and pronunciations, checked before fuzzy scoring
+        self.phonetic = PhoneticIndex.from_menu(menu_data)
+
+        # Deduplicated candidates + trigram prefilter over all names/variations
+        self.matcher = MenuMatcher(all_valid_names, threshold=80, phonetic=self.phonetic)
+
+        # (normalized spoken name, dish type) -> (matched name, unit price or None)
+        # Lives on the snapshot so a menu swap drops stale resolutions with it
+        self.cache = LRUCache(maxsize=cache_size)
+
+    #Deduplicated item names + voice variations
+    @property
+    def names(self) -> list:
+        return self.matcher.names
+
+
+#What a missing, unreadable or malformed menu file raises while a snapshot is built
+MENU_ERRORS = (OSError, ValueError, TypeError, AttributeError)
+
+
+class MenuStore:
+    def __init__(self, path:str, cache_size:int=1024):
+        self.path = path
+        self.cache_size = cache_size
+        self._reload_lock = threading.Lock()
+        self._failed_version = None #last broken file version, so it isn't retried every poll
+        self._current = self._build()
+
+    @property
+    def current(self) -> MenuSnapshot:
+        return self._current
+
+    def _file_version(self) -> tuple:
+        st = os.stat(self.path)
+        return (st.st_mtime_ns, st.st_size)
+
+    def _build(self) -> MenuSnapshot:
+        version = self._file_version()
+        with open(self.path, 'r', encoding='utf-8') as f:
+            menu_data = json.load(f)
+        return MenuSnapshot(menu_data, version, self.cache_size)
+
+    #Rebuilds and swaps in a new snapshot, the old one stays live if the file is broken
+    def reload(self) -> bool:
+        with self._reload_lock:
+            try:
+                snapshot = self._build()
+            except MENU_ERRORS as e:
+                print(f"Menu reload failed, keeping previous menu: {e}")
+                try:
+                    self._failed_version = self._file_version()
+                except OSError:
+                    pass
+                return False
+            self._current = snapshot #single reference assignment = atomic swap
+            print(f"Menu reloaded from {self.path} ({len(snapshot.index)} names)")
+            return True
+
+    def reload_if_changed(self) -> bool:
+        try:
+            version = self._file_version()
+        except OSError:
+            return False
+        if version == self._current.version or version == self._failed_version:
+            return False
+        return self.reload()
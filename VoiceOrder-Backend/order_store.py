@@ -0,0 +1,333 @@
+#Durable order storage for customer_details.
+#   submit() appends the order to a journal file (write-ahead log), fsyncs it and queues it, then returns.
+#   A background writer batches queued orders into SQLite (WAL mode) and truncates the journal
+#   once everything in it is committed. On startup, leftover journal lines are replayed,
+#   so a confirmed order survives a crash or power loss even if it never reached SQLite.
+#The caller waits for one small fsync, never for the database write.
+#The journal is split into segments ({journal}.0, .1, ...) that are rotated by size and deleted once
+#every order in them is committed, so it stays small under steady traffic.
+import glob
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError: #Windows
+    fcntl = None
+
+EPOCH_MS = 1704067200000 #2024-01-01 UTC, custom epoch keeps ids shorter
+
+
+#Snowflake style ids: 41 bits of ms since EPOCH_MS | 10 bits worker id | 12 bits sequence
+#Unique across workers as long as each worker has its own ORDER_WORKER_ID (0-1023)
+class SnowflakeIds:
+    def __init__(self, worker_id:int=0):
+        if not 0 <= worker_id < 1024:
+            raise ValueError("worker_id must be between 0 and 1023")
+        self.worker_id = worker_id
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._seq = 0
+
+    def next_id(self) -> int:
+        with self._lock:
+            now = max(int(time.time() * 1000), self._last_ms) #never go back if the clock does
+            if now == self._last_ms:
+                self._seq = (self._seq + 1) & 0xFFF
+                if self._seq == 0:
+                    # 4096 ids used up in this ms, move on to the next one
+                    while now <= self._last_ms:
+                        now = int(time.time() * 1000)
+                        if now <= self._last_ms:
+                            time.sleep(0.0001)
+            else:
+                self._seq = 0
+            self._last_ms = now
+            return ((now - EPOCH_MS) << 22) | (self.worker_id << 12) | self._seq
+
+
+#Reserves a worker id for this process by holding an exclusive lock on <db_path>.worker-<id>.lock.
+#Every process writing to the same database gets a different id, and the OS drops the lock when
+#the process exits (even on a crash). Returns (worker_id, lock file), keep the file open.
+def claim_worker_id(db_path:str, preferred:int=None):
+    if fcntl is None:
+        if preferred is None:
+            raise RuntimeError("Set ORDER_WORKER_ID: automatic worker ids need fcntl locks")
+        return preferred, None
+
+    candidates = [preferred] if preferred is not None else range(1024)
+    for worker_id in candidates:
+        lock_file = open(f"{db_path}.worker-{worker_id}.lock", 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            continue
+        return worker_id, lock_file
+    if preferred is not None:
+        raise RuntimeError(f"ORDER_WORKER_ID {preferred} is already used by another process on {db_path}")
+    raise RuntimeError(f"All 1024 order worker ids are in use on {db_path}")
+
+#Ex: 1792353541.4 -> "2026-10-18", order numbers restart every day (local time)
+def order_day(created_at:float) -> str:
+    return time.strftime("%Y-%m-%d", time.localtime(created_at))
+
+
+class OrderStore:
+    def __init__(self, db_path:str, journal_path:str, batch_size:int=100, flush_interval:float=0.05,
+                 segment_bytes:int=256 * 1024, number_block:int=20):
+        self.db_path = db_path
+        self.journal_path = journal_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.segment_bytes = segment_bytes
+        self.number_block = number_block #order numbers reserved per database round trip
+
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # FULL: a committed batch must survive power loss, its journal lines are deleted right after
+        self._db.execute("PRAGMA synchronous=FULL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS orders ("
+            "order_id INTEGER PRIMARY KEY, created_at REAL NOT NULL, record TEXT NOT NULL, "
+            "order_day TEXT, order_number INTEGER)"
+        )
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(orders)")}
+        for column, kind in (("order_day", "TEXT"), ("order_number", "INTEGER")):
+            if column not in columns: #databases created before order numbers
+                self._db.execute(f"ALTER TABLE orders ADD COLUMN {column} {kind}")
+        self._db.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS orders_by_number ON orders (order_day, order_number) "
+            "WHERE order_number IS NOT NULL"
+        )
+        # Next free order number per day, shared by every process using this database
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS order_numbers (day TEXT PRIMARY KEY, next_number INTEGER NOT NULL)"
+        )
+        # Orders whose id was already taken by a different order, kept so nothing is lost
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS order_conflicts ("
+            "order_id INTEGER NOT NULL, created_at REAL NOT NULL, record TEXT NOT NULL)"
+        )
+        self._db.commit()
+        self._db_lock = threading.Lock()
+        self.conflicts = 0
+        self._numbers_lock = threading.Lock()
+        self._numbers = {} #day -> [next number, end of the reserved block]
+
+        self.recovered = self._replay_journal()
+
+        self._journal_lock = threading.Lock()
+        self._segment = 0
+        self._segment_size = 0
+        self._segment_pending = {0: 0} #segment -> submitted but not committed yet, guarded by _journal_lock
+        self._journal = open(self._segment_path(0), 'a', encoding='utf-8')
+        self._queue = queue.Queue()
+        self._stop = threading.Event()
+        self._writer = threading.Thread(target=self._write_loop, name="order-writer", daemon=True)
+        self._writer.start()
+
+    def _segment_path(self, segment:int) -> str:
+        return f"{self.journal_path}.{segment}"
+
+    #Journal files left by a previous run: the segments plus the single-file journal older versions wrote
+    def _leftover_journals(self) -> list:
+        segments = glob.glob(glob.escape(self.journal_path) + ".*")
+        segments = [p for p in segments if p.rsplit(".", 1)[1].isdigit()]
+        segments.sort(key=lambda p: int(p.rsplit(".", 1)[1]))
+        if os.path.exists(self.journal_path):
+            segments.insert(0, self.journal_path)
+        return segments
+
+    #Commits whatever a previous run journaled but didn't get into SQLite
+    def _replay_journal(self) -> int:
+        rows = []
+        paths = self._leftover_journals()
+        for path in paths:
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue #torn last line from a crash mid-write
+                    rows.append(self._row(record, line))
+        if rows:
+            self._insert(rows)
+            print(f"Recovered {len(rows)} journaled orders")
+        for path in paths:
+            os.remove(path)
+        return len(rows)
+
+    @staticmethod
+    def _row(record:dict, line:str) -> tuple:
+        return (record["order_id"], record["created_at"], record.get("order_day"), record.get("order_number"), line.strip())
+
+    #Returns (day, number): a short order number the caller can read back, unique per day across
+    #every worker. Numbers are reserved from SQLite in blocks, so most calls don't touch the database
+    def next_order_number(self, created_at:float) -> tuple:
+        day = order_day(created_at)
+        with self._numbers_lock:
+            block = self._numbers.get(day)
+            if block is None or block[0] >= block[1]:
+                start = self._reserve_numbers(day)
+                block = self._numbers[day] = [start, start + self.number_block]
+                for old_day in [d for d in self._numbers if d < day]:
+                    del self._numbers[old_day]
+            number = block[0]
+            block[0] += 1
+        return day, number
+
+    def _reserve_numbers(self, day:str) -> int:
+        with self._db_lock:
+            self._db.execute("BEGIN IMMEDIATE") #other processes wait here, so blocks never overlap
+            try:
+                row = self._db.execute("SELECT next_number FROM order_numbers WHERE day = ?", (day,)).fetchone()
+                start = row[0] if row else 1
+                self._db.execute(
+                    "INSERT OR REPLACE INTO order_numbers (day, next_number) VALUES (?, ?)",
+                    (day, start + self.number_block)
+                )
+                self._db.commit()
+            except BaseException:
+                self._db.rollback()
+                raise
+        return start
+
+    #Plain INSERT so an id collision is an error, not a silently dropped order.
+    #On a conflict the batch is retried row by row: re-inserting the exact same order (a replay of a
+    #journal line that was already committed) is skipped, a different order with a taken id goes
+    #to order_conflicts and is reported
+    def _insert(self, rows:list):
+        with self._db_lock:
+            try:
+                self._db.executemany("INSERT INTO orders (order_id, created_at, order_day, order_number, record) VALUES (?, ?, ?, ?, ?)", rows)
+                self._db.commit()
+                return
+            except sqlite3.IntegrityError:
+                self._db.rollback()
+
+            for row in rows:
+                try:
+                    self._db.execute("INSERT INTO orders (order_id, created_at, order_day, order_number, record) VALUES (?, ?, ?, ?, ?)", row)
+                except sqlite3.IntegrityError:
+                    existing = self._db.execute("SELECT record FROM orders WHERE order_id = ?", (row[0],)).fetchone()
+                    if existing and json.loads(existing[0]) == json.loads(row[4]):
+                        continue
+                    self._db.execute(
+                        "INSERT INTO order_conflicts (order_id, created_at, record) VALUES (?, ?, ?)",
+                        (row[0], row[1], row[4])
+                    )
+                    self.conflicts += 1
+                    print(f"ERROR: order id {row[0]} or number {row[3]} already belongs to another order, saved to order_conflicts")
+            self._db.commit()
+
+    #Journals (fsynced) and queues the order, returns without waiting for the database write
+    def submit(self, record:dict):
+        line = json.dumps(record, default=str) + "\n"
+        with self._journal_lock:
+            self._journal.write(line)
+            self._journal.flush()
+            os.fsync(self._journal.fileno()) #on disk before the caller hears the order is placed
+            segment = self._segment
+            self._segment_pending[segment] += 1
+            self._segment_size += len(line)
+            if self._segment_size >= self.segment_bytes:
+                # Start a new segment, this one is deleted once all of its orders are committed
+                self._journal.close()
+                self._segment += 1
+                self._segment_size = 0
+                self._segment_pending[self._segment] = 0
+                self._journal = open(self._segment_path(self._segment), 'a', encoding='utf-8')
+                self._fsync_dir() #the new segment's directory entry
+        self._queue.put((*self._row(record, line), segment))
+
+    def _fsync_dir(self):
+        if not hasattr(os, "O_DIRECTORY"):
+            return #Windows
+        fd = os.open(os.path.dirname(os.path.abspath(self.journal_path)), os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    #Called after a batch is committed, drops journal data that is now safely in SQLite
+    def _committed(self, batch:list):
+        with self._journal_lock:
+            for *_, segment in batch:
+                self._segment_pending[segment] -= 1
+            for segment, pending in list(self._segment_pending.items()):
+                if pending:
+                    continue
+                if segment == self._segment:
+                    # Everything in the open segment is in SQLite now
+                    self._journal.seek(0)
+                    self._journal.truncate()
+                    self._segment_size = 0
+                else:
+                    os.remove(self._segment_path(segment))
+                    del self._segment_pending[segment]
+
+    def _write_loop(self):
+        while not (self._stop.is_set() and self._queue.empty()):
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+
+            # Collect whatever else arrives within the flush window, up to batch_size
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            try:
+                self._insert([item[:5] for item in batch])
+            except sqlite3.Error as e:
+                print(f"Order batch write failed, retrying (orders are still in the journal): {e}")
+                time.sleep(self.flush_interval)
+                for item in batch:
+                    self._queue.put(item)
+                continue
+
+            self._committed(batch)
+
+    def get(self, order_id:int):
+        with self._db_lock:
+            row = self._db.execute("SELECT record FROM orders WHERE order_id = ?", (order_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    #Ex: find_by_number(42) -> today's order 42, for staff reading back the number the caller was given
+    def find_by_number(self, order_number:int, day:str=None):
+        day = day or order_day(time.time())
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT record FROM orders WHERE order_day = ? AND order_number = ?", (day, int(order_number))
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    #Waits for queued orders to be committed
+    def flush(self, timeout:float=5.0) -> bool:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._journal_lock:
+                if not any(self._segment_pending.values()):
+                    return True
+            time.sleep(self.flush_interval / 2)
+        return False
+
+    def close(self):
+        self._stop.set()
+        self._writer.join(timeout=5)
+        with self._journal_lock:
+            self._journal.close()
+        with self._db_lock:
+            self._db.close()
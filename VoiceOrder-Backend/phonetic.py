@@ -0,0 +1,73 @@
+#Phonetic keys for spoken menu item names, so ASR mishearings like "plane dosa" or "massala dosa"
+#resolve with one dict lookup instead of fuzzy scoring.
+#The key is a simplified Metaphone tuned for Indian dish names: spaces are ignored ("my sore" == "mysore"),
+#similar sounding consonants share a code, vowels after the first letter and doubled letters are dropped.
+import re
+
+#Applied in order, multi-letter sounds first
+_REPLACEMENTS = (
+    ("tch", "C"), ("ch", "C"), ("sh", "s"), ("ph", "f"), ("gh", "g"), ("kh", "k"), ("bh", "b"),
+    ("dh", "d"), ("th", "t"), ("ck", "k"), ("q", "k"), ("x", "ks"), ("z", "s"), ("v", "w")
+)
+_VOWELS = set("aeiouy")
+MIN_KEY_LENGTH = 3 #shorter keys ("n" for naan) are too easy to hit by accident
+
+
+def phonetic_key(text:str) -> str:
+    word = re.sub(r"[^a-z]", "", str(text).lower())
+    if not word:
+        return ""
+    for src, dst in _REPLACEMENTS:
+        word = word.replace(src, dst)
+    # "c" that wasn't part of "ch": soft before e/i/y, k otherwise (ex: "cauliflower")
+    word = re.sub(r"c(?=[eiy])", "s", word).replace("c", "k")
+
+    key = [] if word[0] not in _VOWELS else ["A"]
+    for ch in word:
+        if ch in _VOWELS or ch == "h":
+            continue
+        if key and key[-1] == ch:
+            continue
+        key.append(ch)
+    return "".join(key)
+
+
+class PhoneticIndex:
+    def __init__(self):
+        self._keys = {} #key -> set of item names it points to
+
+    def add(self, text:str, item_name:str):
+        key = phonetic_key(text)
+        if len(key) >= MIN_KEY_LENGTH:
+            self._keys.setdefault(key, set()).add(item_name)
+
+    #Item name for the spoken text, None if there's no entry or the key is shared by several items
+    def lookup(self, text:str):
+        names = self._keys.get(phonetic_key(text))
+        if names and len(names) == 1:
+            return next(iter(names))
+        return None
+
+    def __len__(self):
+        return len(self._keys)
+
+    #Built at menu load from item names, voice_variations and the pronunciation hints
+    @classmethod
+    def from_menu(cls, menu_data:dict) -> "PhoneticIndex":
+        index = cls()
+        for sections, items in menu_data.get("menu", {}).items():
+            if not isinstance(items, list):
+                continue
+            for item in items:
+                name = item.get("name") if isinstance(item, dict) else None
+                if not isinstance(name, str) or not name:
+                    continue
+                item_name = name.lower()
+                index.add(item_name, item_name)
+                for v in item.get("voice_variations", []) or []:
+                    if isinstance(v, str) and v:
+                        index.add(v, item_name)
+                pronunciation = item.get("pronunciation")
+                if isinstance(pronunciation, str) and pronunciation:
+                    index.add(pronunciation, item_name)
+        return index
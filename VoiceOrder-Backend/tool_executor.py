@@ -0,0 +1,42 @@
+#Runs webhook tools without blocking the event loop.
+#   async tools       -> awaited directly
+#   offloaded tools   -> bounded thread pool (blocking I/O like the Google Maps call)
+#   inline tools      -> called directly (pure CPU work that's cheaper than a thread hop)
+#Each tool can also have its own concurrency limit so one slow dependency can't take every worker thread.
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ToolExecutor:
+    def __init__(self, max_workers:int=16, limits:dict=None):
+        self.max_workers = max_workers
+        self.limits = dict(limits or {}) #tool name -> max concurrent executions
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool")
+        self._semaphores = {}
+
+    def _semaphore(self, name:str):
+        limit = self.limits.get(name)
+        if not limit:
+            return None
+        if name not in self._semaphores:
+            self._semaphores[name] = asyncio.Semaphore(limit)
+        return self._semaphores[name]
+
+    async def _call(self, fn, args, kwargs, offload:bool):
+        if asyncio.iscoroutinefunction(fn):
+            return await fn(*args, **kwargs)
+        if not offload:
+            return fn(*args, **kwargs)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, functools.partial(fn, *args, **kwargs))
+
+    async def run(self, name:str, fn, *args, offload:bool=True, **kwargs):
+        semaphore = self._semaphore(name)
+        if semaphore is None:
+            return await self._call(fn, args, kwargs, offload)
+        async with semaphore:
+            return await self._call(fn, args, kwargs, offload)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
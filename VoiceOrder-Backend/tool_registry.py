@@ -0,0 +1,109 @@
+#Explicit registry of the tools Ultravox can call through /webhook.
+#Each tool has a Pydantic argument model (validated before the handler runs), an execution mode
+#for ToolExecutor and an optional concurrency limit. Dispatch is a single dict lookup by tool name.
+import os
+from typing import Any, Dict, List, Optional, Union
+
+from pydantic import BaseModel, TypeAdapter, ValidationError, field_validator
+
+from tools import calculate_order, validate_delivery_address, customer_details, get_price
+
+
+_QUANTITY = TypeAdapter(int) #same lax rules as GetPriceArgs.quantity: 2, 2.0 and "2" are all 2
+_STYLE = TypeAdapter(str)
+
+#Ex: {"gobi manchurian": [1, "gravy", "extra spicy"]} -> [quantity, style, notes(optional)]
+#Returns the cart with quantity/style coerced, so every tool accepts the same inputs
+def _check_cart(cart_items:dict) -> dict:
+    checked = {}
+    for item_name, details in cart_items.items():
+        if len(details) < 2:
+            raise ValueError(f"'{item_name}' needs at least [quantity, style]")
+        try:
+            quantity = _QUANTITY.validate_python(details[0])
+        except ValidationError:
+            raise ValueError(f"'{item_name}' quantity must be an integer")
+        try:
+            style = _STYLE.validate_python(details[1])
+        except ValidationError:
+            raise ValueError(f"'{item_name}' style must be a string")
+        checked[item_name] = [quantity, style, *details[2:]]
+    return checked
+
+class CalculateOrderArgs(BaseModel):
+    cart_items: Dict[str, List[Any]]
+    restaurant_id: Optional[str] = None
+
+    _cart = field_validator("cart_items")(_check_cart)
+
+class ValidateAddressArgs(BaseModel):
+    address_txt: str
+
+class CustomerDetailsArgs(BaseModel):
+    first_name: str
+    last_name: str
+    phone: Union[str, int]
+    address: Optional[str] = None #pickup orders send null
+    cart_items: Dict[str, List[Any]]
+
+    _cart = field_validator("cart_items")(_check_cart)
+
+class GetPriceArgs(BaseModel):
+    item_name: str
+    quantity: int
+    dish_type: str = "standard"
+    restaurant_id: Optional[str] = None
+
+
+class ToolSpec:
+    def __init__(self, name:str, handler, args_model, offload:bool=True, concurrency:int=None):
+        self.name = name
+        self.handler = handler
+        self.args_model = args_model
+        self.offload = offload #False = cheap CPU work, run inline on the event loop
+        self.concurrency = concurrency
+
+    #Validates the raw payload, raises pydantic.ValidationError on bad arguments
+    def parse(self, payload:dict) -> dict:
+        return self.args_model.model_validate(payload).model_dump()
+
+    #Menu-backed tools take a restaurant_id, others ignore it
+    @property
+    def per_restaurant(self) -> bool:
+        return "restaurant_id" in self.args_model.model_fields
+
+
+TOOLS = {}
+
+def register_tool(spec:ToolSpec):
+    TOOLS[spec.name] = spec
+    return spec
+
+register_tool(ToolSpec("calculate_order", calculate_order, CalculateOrderArgs, offload=False))
+register_tool(ToolSpec("get_price", get_price, GetPriceArgs, offload=False))
+register_tool(ToolSpec(
+    "validate_delivery_address", validate_delivery_address, ValidateAddressArgs,
+    concurrency=int(os.getenv("ADDRESS_TOOL_CONCURRENCY", "8"))
+))
+register_tool(ToolSpec(
+    "customer_details", customer_details, CustomerDetailsArgs,
+    concurrency=int(os.getenv("ORDER_TOOL_CONCURRENCY", "8"))
+))
+
+def get_tool(name:str):
+    return TOOLS.get(name)
+
+def concurrency_limits() -> dict:
+    return {name: spec.concurrency for name, spec in TOOLS.items() if spec.concurrency}
+
+#Old agent configs post every tool to the bare /webhook, kept only for those
+def infer_tool_name(payload:dict):
+    if "cart_items" in payload and "first_name" not in payload:
+        return "calculate_order"
+    if "address_txt" in payload:
+        return "validate_delivery_address"
+    if "first_name" in payload and "cart_items" in payload:
+        return "customer_details"
+    if "item_name" in payload and "quantity" in payload:
+        return "get_price"
+    return None
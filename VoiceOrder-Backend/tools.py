@@ -1,131 +1,129 @@
-import json
 import os
 from dotenv import load_dotenv
 import googlemaps
-import random
+import time
 import re
-from thefuzz import process
+from menu_index import normalize_name, resolve_unit_price
+from lru_cache import MISSING
+from menu_registry import MenuRegistry
+from address_cache import AddressCache, normalize_address
+from delivery_zones import ZoneTable, OUT_OF_ZONE
+from order_store import OrderStore, SnowflakeIds, claim_worker_id
 
 load_dotenv()
 
 # Load the menu with absolute path safety
 base_dir = os.path.dirname(os.path.abspath(__file__))
 menu_path = os.path.join(base_dir, "latestMenu.json")
-with open(menu_path, 'r', encoding='utf-8') as f:
-    menu_data = json.load(f)
-
-#Func to convert "$5.99" to 5.99
-def parse_price(price_str:str) -> float:
-    if not price_str: return 0.0
-   
-    # removing '$' and take first part if there's extra text
-    clean_str = price_str.replace("$","").split()[0]
-    try:
-        return float(clean_str)
-    except ValueError:
-        return 0.0
 
-full_menu = menu_data.get("menu",{})
+# One hot-reloadable menu store per restaurant, loaded on first use (MENUS_DIR/<restaurant_id>.json)
+# latestMenu.json is the default restaurant's menu
+menu_registry = MenuRegistry(
+    os.getenv("MENUS_DIR", os.path.join(base_dir, "menus")),
+    default_id=os.getenv("DEFAULT_RESTAURANT_ID", "default"),
+    default_path=menu_path,
+    memory_budget=int(float(os.getenv("MENU_MEMORY_BUDGET_MB", "256")) * 1024 * 1024),
+    poll_interval=float(os.getenv("MENU_POLL_INTERVAL", "2")),
+    cache_size=int(os.getenv("PRICE_CACHE_SIZE", "1024"))
+)
 
-all_valid_names = []
-for sections, items in full_menu.items():
-    if isinstance(items, list):
-        for item in items:
-            name = item.get("name")
-            if name: 
-                all_valid_names.append(name.lower())
-            
-            variations = item.get("voice_variations", [])
-            all_valid_names.extend([v.lower() for v in variations if v])
+# Default restaurant's store, never evicted
+menu_store = menu_registry.get()
 
-#Helper func to  fuzzy name matching
-def fuzzy(item_name:str)->str:
-        best_match, score = process.extractOne(item_name.lower(), all_valid_names)
+#Menu snapshot to price against, raises UnknownRestaurantError for ids without a menu
+def current_menu(restaurant_id:str = None):
+    return menu_registry.get(restaurant_id).current
 
-        if score < 80:
+#Picks the fuzzy match if it's confident enough, otherwise keeps the spoken name
+def _pick_match(item_name:str, best_match:str, score:int, threshold:int) -> str:
+        if score < threshold:
             print(f"NO CONFIDENT MATCH FOUND FOR {item_name}, THE BEST MATCH IS FOR {best_match} WITH A SCORE OF {score}")
             return item_name
         else:
             print(f"BEST MATCH FOUND FOR {item_name}, THE BEST MATCH IS FOR {best_match} WITH A SCORE OF {score} ")
             return best_match
 
-def get_price(item_name: str, quantity: int, dish_type: str) -> float:
+#Helper func to  fuzzy name matching
+def fuzzy(item_name:str, snapshot=None, restaurant_id:str = None)->str:
+        menu_matcher = (snapshot or current_menu(restaurant_id)).matcher
+        best_match, score = menu_matcher.match(item_name)
+        return _pick_match(item_name, best_match, score, menu_matcher.threshold)
+
+#Resolves many (item name, dish type) pairs against one snapshot
+#Returns {(normalized name, dish type): (matched name, unit price or None)}, each distinct pair is resolved once
+def resolve_items(pairs:list, snapshot=None, restaurant_id:str = None) -> dict:
+    snapshot = snapshot or current_menu(restaurant_id) #one snapshot for the whole batch
+    resolved = {}
+    pending = {}
+
+    for item_name, dish_type in pairs:
+        item_type = dish_type.lower().strip() #To check if the dish has gravy/dry option pricing
+        key = (normalize_name(item_name), item_type)
+        if key in resolved or key in pending:
+            continue
+        cached = snapshot.cache.get(key)
+        if cached is not MISSING:
+            resolved[key] = cached
+        else:
+            pending[key] = item_name.strip()
+
+    if pending:
+        # One fuzzy match per distinct name, even if it's ordered in several styles
+        names = {}
+        for key, raw_name in pending.items():
+            names.setdefault(key[0], raw_name)
+        matcher = snapshot.matcher
+        matches = matcher.match_many(list(names.values()))
+
+        lookup_names = {}
+        for (norm_name, raw_name), (best_match, score) in zip(names.items(), matches):
+            lookup_names[norm_name] = _pick_match(raw_name, best_match, score, matcher.threshold)
+
+        for key in pending:
+            record = snapshot.index.get(normalize_name(lookup_names[key[0]]))
+            if record is None:
+                value = (None, None)
+            else:
+                value = (record.name, resolve_unit_price(record, key[1]))
+            snapshot.cache.put(key, value)
+            resolved[key] = value
+
+    return resolved
+
+#Returns (matched name, unit price), unit price is None when the item/style can't be priced
+def resolve_item(item_name:str, dish_type:str, snapshot=None, restaurant_id:str = None) -> tuple:
+    resolved = resolve_items([(item_name, dish_type)], snapshot, restaurant_id)
+    return next(iter(resolved.values()))
+
+def get_price(item_name: str, quantity: int, dish_type: str, restaurant_id: str = None) -> float:
     
-    lookup_name = fuzzy(item_name.strip()) #dish name
-    item_type = dish_type.lower().strip() #To check if the dish has gravy/dry option pricing
-    full_menu = menu_data.get("menu",{})
-
-    for sections, items in full_menu.items(): 
-        if isinstance(items,list):              #Ex: Dosa Sec in menu data
-            for item in items:
-                if item.get("name","").lower() == lookup_name:  
-                    try:
-                        price_data = item.get("price")
-                        if not price_data:
-                            # If no simple price, checking under price options
-                            # If key doesn't exis: returns None or raises error depending on access
-                            options = item.get("price_options", {})
-                            if options and item_type in options:
-                                price_data = options[item_type]
-                            else:
-                                # Check for variations (e.g. Naan methods)
-                                variations = item.get("variations", [])
-                                found_var = False
-                                for var in variations:
-                                    if item_type and item_type in var.get("type", "").lower():
-                                        price_data = var.get("price")
-                                        found_var = True
-                                        break
-                                
-                                if not found_var:
-                                    return 0.0 # Return 0 if type not found or no options
-        
-                        return parse_price(price_data) * quantity
-                    except (KeyError, TypeError, AttributeError):
-                        return 0.0
-                
-                #Else: Checking for voice variations
-                if "voice_variations" in item:
-                    variations=item.get("voice_variations",[])      
-                    for v in variations:
-                        if v.lower()==lookup_name:
-                            try:
-                                price_data = item.get("price")
-                                if not price_data:
-                                    options = item.get("price_options", {})
-                                    if options and item_type in options:
-                                        price_data = options[item_type]
-                                    else:
-                                        # Check for variations (e.g. Naan methods)
-                                        variations = item.get("variations", [])
-                                        found_var = False
-                                        for var in variations:
-                                            if item_type and item_type in var.get("type", "").lower():
-                                                price_data = var.get("price")
-                                                found_var = True
-                                                break
-                                        
-                                        if not found_var:
-                                            return 0.0
-                                return parse_price(price_data) * quantity
-                            except (KeyError, TypeError, AttributeError):
-                                return 0.0
-    print(f"Item name: {item_name} NOT FOUND in menu")
-    return 0.0
-
-def calculate_order(cart_items: dict) -> dict:
+    matched_name, unit_price = resolve_item(item_name, dish_type, restaurant_id=restaurant_id)
+    if matched_name is None:
+        print(f"Item name: {item_name} NOT FOUND in menu")
+        return 0.0
+
+    if unit_price is None:
+        return 0.0 # Return 0 if type not found or no options
+    return unit_price * quantity
+
+def calculate_order(cart_items: dict, restaurant_id: str = None) -> dict:
     # Ex: cart_items={'gobi_manchurian': [1, 'gravy', 'notes'], ...}
     total_price = 0.0
     breakdown = []
+
+    # Resolve every line in one pass, repeated names/styles are only matched once
+    resolved = resolve_items([(item_name, details[1]) for item_name, details in cart_items.items()], restaurant_id=restaurant_id)
     
     for item_name, details in cart_items.items():
         qty = details[0]
         style = details[1]
         notes = details[2] if len(details) > 2 else ""
         
-        # Calculate line item price
-        # get_price returns total for that quantity. e.g. 2 * 12.99
-        line_price = get_price(item_name, qty, style)
+        # Calculate line item price. e.g. 2 * 12.99
+        matched_name, unit = resolved[(normalize_name(item_name), style.lower().strip())]
+        if matched_name is None:
+            print(f"Item name: {item_name} NOT FOUND in menu")
+        line_price = unit * qty if unit is not None else 0.0
         unit_price = line_price / qty if qty > 0 else 0.0
         
         total_price += line_price
@@ -147,20 +145,68 @@ def calculate_order(cart_items: dict) -> dict:
 GMAPS_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
 gmaps = googlemaps.Client(key=GMAPS_KEY)
 
+#Swap the Maps client, ex: fake_maps.FakeMapsClient in tests
+def set_maps_client(client):
+    global gmaps
+    gmaps = client
+
+# Serviceable zips/cities (+ optional radius/polygon areas), also used to reject addresses offline
+zone_table = ZoneTable.from_file(os.getenv("DELIVERY_ZONES_PATH", os.path.join(base_dir, "delivery_zones.json")))
+
+# Validation results keyed by normalized address text, so repeats skip the Maps round trip
+address_cache = AddressCache(
+    os.getenv("ADDRESS_CACHE_PATH", os.path.join(base_dir, "address_cache.sqlite3")),
+    ttl_seconds=float(os.getenv("ADDRESS_CACHE_TTL", str(7 * 24 * 3600)))
+)
+
+#Calls Maps and keeps only what the delivery decision needs. The service zone isn't stored,
+#it's decided on every read so edits to delivery_zones.json apply to cached addresses too
+#Returns (record, cacheable), API error bodies come back without a 'result' and aren't cached
+def _lookup_address(address_txt:str) -> tuple:
+    response = gmaps.addressvalidation(
+        [address_txt],
+        enableUspsCass = True #US addresses
+    )
+    result = response.get('result',{})
+    verdict = result.get('verdict',{})
+    usps_data = result.get('uspsData',{})
+
+    #Checking if address is in servicable zips
+    std_address = usps_data.get('standardizedAddress',{})
+    zip_code = std_address.get('zipCode','').split('-')[0][:5] #Slicing the first 5 numbers of zip, ex: 75034-1234
+    city = std_address.get('city','').lower()
+
+    record = {
+        "dpv": usps_data.get('dpvConfirmation',''), # Extracting dpv info from gmap response
+        "granularity": verdict.get('validationGranularity'),
+        "next_action": verdict.get('possibleNextAction'),
+        "zip": zip_code,
+        "city": city,
+        "formatted_address": result.get('address',{}).get('formattedAddress')
+    }
+    return record, 'result' in response
+
+OUT_OF_RANGE = {
+    "valid":False,
+    "status": "out_of_range",
+    "message": "The given address is outside our delivery zone. Shall we do a pickup order instead?"
+}
+
 def validate_delivery_address(address_txt:str) ->dict:
-    SERVICEABLE_ZIPS = ["75034", "75035", "75033", "75093"]
-    SERVICEABLE_CITIES = ["frisco", "plano"]
     try:
-        response = gmaps.addressvalidation(
-            [address_txt],
-            enableUspsCass = True #US addresses
-        )
-        result = response.get('result',{})
-        verdict = result.get('verdict',{})
-        usps_data = result.get('uspsData',{})
+        #Spoken zip known to be outside every serviceable city, no need to ask Google
+        if zone_table.precheck(address_txt) == OUT_OF_ZONE:
+            print(f"Address rejected offline (outside delivery zone): {address_txt}")
+            return dict(OUT_OF_RANGE)
 
-        # Extracting dpv info from gmap response
-        dpv = usps_data.get('dpvConfirmation','')
+        cache_key = normalize_address(address_txt)
+        record = address_cache.get(cache_key)
+        if record is None:
+            record, cacheable = _lookup_address(address_txt)
+            if cacheable:
+                address_cache.put(cache_key, record)
+
+        dpv = record["dpv"]
 
         """
         DPV "Y": The address is 100% confirmed.
@@ -170,7 +216,7 @@ def validate_delivery_address(address_txt:str) ->dict:
         """
 
         #Handling missing apt number
-        if dpv in ['D','S'] or verdict.get('possibleNextAction') == 'CONFIRM_ADD_SUBPREMISES':
+        if dpv in ['D','S'] or record["next_action"] == 'CONFIRM_ADD_SUBPREMISES':
             return{
                 "valid": False,
                 "status": "missing_subpremise",
@@ -178,31 +224,22 @@ def validate_delivery_address(address_txt:str) ->dict:
             }
         
         #Handling invalid apt number
-        if dpv == 'N' or verdict.get('validationGranularity') not in ['PREMISE',"SUBPREMISE"]:
+        if dpv == 'N' or record["granularity"] not in ['PREMISE',"SUBPREMISE"]:
             return{
                 "valid": False,
                 "status": "invalid_address",
                 "message": "Could not find the specified house number, could you please repeat the full address"
             }
         
-        #Checking if address is in servicable zips
-        std_address = usps_data.get('standardizedAddress',{})
-        zip_code = std_address.get('zipCode','').split('-')[0][:5] #Slicing the first 5 numbers of zip, ex: 75034-1234
-        city = std_address.get('city','').lower()
-
-        if zip_code in SERVICEABLE_ZIPS or city in SERVICEABLE_CITIES:
+        if zone_table.is_serviceable(record["zip"], record["city"]):
             return{
                 "valid":True,
                 "status": "success",
                 "message": "Address verified",
-                "formatted_address": result.get('address',{}).get('formattedAddress')
+                "formatted_address": record["formatted_address"]
             }
         else:
-            return{
-                "valid":False,
-                "status": "out_of_range",
-                "message": "The given address is outside our delivery zone. Shall we do a pickup order instead?"
-            }
+            return dict(OUT_OF_RANGE)
     except Exception as e:
         print(f"Address Validation Error: {e}")
         return{
@@ -211,6 +248,17 @@ def validate_delivery_address(address_txt:str) ->dict:
             }
 
 
+# Collision-free order ids + journaled, batched SQLite writes (see order_store.py)
+# Every process writing to the same database claims its own worker id (0-1023) at import, so
+# uvicorn --workers N is safe. ORDER_WORKER_ID pins the id, startup fails if another process holds it
+ORDER_DB_PATH = os.getenv("ORDER_DB_PATH", os.path.join(base_dir, "orders.sqlite3"))
+_pinned_worker_id = os.getenv("ORDER_WORKER_ID")
+ORDER_WORKER_ID, _worker_lock = claim_worker_id(ORDER_DB_PATH, int(_pinned_worker_id) if _pinned_worker_id else None)
+order_ids = SnowflakeIds(ORDER_WORKER_ID)
+# One journal per worker id, ex: orders.journal -> orders-3.journal, so no process replays another's
+_journal_root, _journal_ext = os.path.splitext(os.getenv("ORDER_JOURNAL_PATH", os.path.join(base_dir, "orders.journal")))
+order_store = OrderStore(ORDER_DB_PATH, f"{_journal_root}-{ORDER_WORKER_ID}{_journal_ext}")
+
 def customer_details(first_name:str, last_name:str, phone:str, address:str, cart_items:dict) -> dict:
     try:
         clean_first = first_name.strip().capitalize()
@@ -224,7 +272,9 @@ def customer_details(first_name:str, last_name:str, phone:str, address:str, cart
                 "message": "The phone number is invalid. Please repeat your phone number"
             }
         
-        order_id = random.randint(100, 999) #Assigning random int for testing purpose
+        order_id = order_ids.next_id()
+        created_at = time.time()
+        day, order_number = order_store.next_order_number(created_at) #short, unique per day
         
         #Customer record using the passed items
         customer_record = {
@@ -232,14 +282,18 @@ def customer_details(first_name:str, last_name:str, phone:str, address:str, cart
             "Phone": clean_phone,
             "address": address,
             "order_id": order_id,
-            "order_details": cart_items
+            "order_day": day,
+            "order_number": order_number,
+            "order_details": cart_items,
+            "created_at": created_at
         }
         print(f"Customer Record: {customer_record}")
+        order_store.submit(customer_record) #journaled now, committed to SQLite in the background
 
         return{
             "success": True,
             "message": f"Thank you, {clean_first} your order has been placed",
-            "order_id": f"Order id: {order_id}"
+            "order_id": f"Order number: {order_number}"
         }
     except Exception as e:
         print(f"Customer Details Error: {e}")
@@ -0,0 +1,86 @@
+#Bounded pool of reusable autogen agents.
+#Agents are built on demand up to max_size and handed out one request at a time. On return the
+#agent's conversation state is cleared with on_reset(), so the next caller starts fresh without
+#paying for construction, tool schema generation or a new model client. When every agent is busy,
+#callers wait for one to come back instead of building more, which keeps memory bounded under load.
+import asyncio
+from contextlib import asynccontextmanager
+
+from autogen_core import CancellationToken
+
+
+class AgentPool:
+    def __init__(self, factory, max_size:int=4):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.factory = factory #builds one agent
+        self.max_size = max_size
+        self._idle = [] #agents ready to use, most recently returned last
+        self._created = 0
+        self._condition = None
+        self.checkouts = 0
+        self.waits = 0
+
+    #Created on first use so it binds to the running event loop
+    def _get_condition(self) -> asyncio.Condition:
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    #Builds agents ahead of the first requests, ex: at startup
+    def fill(self, count:int=None):
+        count = self.max_size if count is None else min(count, self.max_size)
+        while self._created < count:
+            self._idle.append(self.factory())
+            self._created += 1
+
+    async def _acquire(self):
+        condition = self._get_condition()
+        async with condition:
+            if not self._idle and self._created >= self.max_size:
+                self.waits += 1
+            while not self._idle and self._created >= self.max_size:
+                await condition.wait()
+            self.checkouts += 1
+            if self._idle:
+                return self._idle.pop()
+            self._created += 1
+        try:
+            return self.factory()
+        except Exception:
+            async with condition:
+                self._created -= 1
+                condition.notify()
+            raise
+
+    async def _release(self, agent, reusable:bool):
+        if reusable:
+            try:
+                await agent.on_reset(CancellationToken())
+            except Exception as e:
+                print(f"Agent reset failed, dropping it from the pool: {e}")
+                reusable = False
+        condition = self._get_condition()
+        async with condition:
+            if reusable:
+                self._idle.append(agent)
+            else:
+                self._created -= 1 #a replacement gets built on the next checkout
+            condition.notify()
+
+    #async with pool.checkout() as agent: ... (an agent whose run raised is discarded, not reused)
+    @asynccontextmanager
+    async def checkout(self):
+        agent = await self._acquire()
+        try:
+            yield agent
+        except BaseException:
+            await asyncio.shield(self._release(agent, reusable=False))
+            raise
+        await self._release(agent, reusable=True)
+
+    def stats(self) -> dict:
+        return {
+            "size": self._created, "idle": len(self._idle), "max_size": self.max_size,
+            "checkouts": self.checkouts, "waits": self.waits
+        }
@@ -1,45 +1,83 @@
 import os
+import time
 from autogen_agentchat.agents import AssistantAgent
 from autogen_ext.models.openai import OpenAIChatCompletionClient
 from autogen_agentchat.teams import SelectorGroupChat
 from autogen_core.tools import FunctionTool
 from autogen_agentchat.conditions import MaxMessageTermination
 from dotenv import load_dotenv
-from ehr_project.tools import create_patient_db
+from ehr_project.tools import create_patient_db_async
+from ehr_project.agent_pool import AgentPool
+from ehr_project.registration_parser import FastPathStats, parse_registration
 import asyncio
 
 load_dotenv()
 
-async def run_admin_agent(instruction: str) -> str:
-    model_client=OpenAIChatCompletionClient(
-        model="gpt-5-nano",
-        api_key=os.getenv("OPENAI_API_KEY")
-    )
-
-    register_tool = FunctionTool(
-            create_patient_db, 
-            description="Creates a new patient. Extracts first_name, last_name, and dob from the user prompt."
-        )
-
-    registrar = AssistantAgent(
-            name="registrar",
-            model_client=model_client,
-            tools=[register_tool],
-            system_message="""
+REGISTRAR_SYSTEM_MESSAGE = """
             You are a Hospital Registrar.
             Your ONLY job is to register new patients.
-            
+
             PROTOCOL:
             1. Parse the user instruction for 'first_name', 'last_name', and 'dob'.
             2. If 'dob' is missing, assume '1990-01-01'.
             3. Call the 'create_patient_db' tool.
             4. Reply with a short, spoken-style confirmation (e.g., "I've successfully registered John Doe.").
             """
+
+# Built once and shared by every registrar: one model client (one HTTP connection pool) and one tool schema
+model_client = OpenAIChatCompletionClient(
+    model="gpt-5-nano",
+    api_key=os.getenv("OPENAI_API_KEY")
+)
+
+register_tool = FunctionTool(
+        create_patient_db_async,
+        name="create_patient_db",
+        description="Creates a new patient. Extracts first_name, last_name, and dob from the user prompt."
+    )
+
+def build_registrar() -> AssistantAgent:
+    return AssistantAgent(
+            name="registrar",
+            model_client=model_client,
+            tools=[register_tool],
+            system_message=REGISTRAR_SYSTEM_MESSAGE
         )
 
-    response = await registrar.run(task=instruction)
+#Warm registrars reused across requests, see agent_pool.py
+registrar_pool = AgentPool(build_registrar, max_size=int(os.getenv("REGISTRAR_POOL_SIZE", "4")))
+
+REGISTRATION_FAST_PATH = os.getenv("REGISTRATION_FAST_PATH", "1") == "1"
+registration_stats = FastPathStats()
+
+async def run_admin_agent(instruction: str) -> str:
+    started = time.perf_counter()
+    async with registrar_pool.checkout() as registrar:
+        response = await registrar.run(task=instruction)
+
+    tokens = sum(
+        m.models_usage.prompt_tokens + m.models_usage.completion_tokens
+        for m in response.messages if getattr(m, "models_usage", None)
+    )
+    registration_stats.record_agent(time.perf_counter() - started, tokens)
 
     final_text = response.messages[-1].content
     print(f"AGENT RESPONSE: {final_text}")
-        
+
     return final_text
+
+#Plain "register <first> <last> born <date>" instructions skip the LLM, everything else goes to the agent
+async def run_registration(instruction: str) -> str:
+    parsed = parse_registration(instruction) if REGISTRATION_FAST_PATH else None
+    if parsed is None:
+        return await run_admin_agent(instruction)
+
+    started = time.perf_counter()
+    result = await create_patient_db_async(**parsed)
+    registration_stats.record_fast(time.perf_counter() - started)
+
+    full_name = f"{parsed['first_name']} {parsed['last_name']}"
+    print(f"FAST PATH: {full_name} ({parsed['dob']}) -> {result}")
+    if result.startswith("Success"):
+        return f"I've successfully registered {full_name}."
+    return f"I couldn't register {full_name} right now. Please try again in a moment."
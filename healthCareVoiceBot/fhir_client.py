@@ -0,0 +1,76 @@
+#Async client for the Medplum FHIR API, shared by every request handler.
+#One httpx.AsyncClient keeps a keep-alive connection pool (HTTP/2 when the h2 package is installed),
+#every request has a timeout and a semaphore caps how many are in flight at once.
+#Auth comes from the shared TokenManager, a 401 gets one retry with a new token.
+import asyncio
+
+import httpx
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class FhirClient:
+    def __init__(self, base_url:str, token_manager, timeout:float=10.0, max_connections:int=20, concurrency:int=20):
+        self.base_url = base_url.rstrip("/")
+        self.token_manager = token_manager
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.concurrency = concurrency
+        self._client = None
+        self._semaphore = None
+
+    #Created on first use so it binds to the running event loop
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                timeout=httpx.Timeout(self.timeout),
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+            )
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._client
+
+    async def _token(self, stale=None):
+        if stale is None:
+            token = self.token_manager.cached_token()
+            if token:
+                return token
+        # Token endpoint call is blocking (requests), keep it off the event loop
+        return await asyncio.to_thread(self.token_manager.refresh, stale)
+
+    #Returns the httpx.Response, or None if no token could be obtained
+    async def request(self, method:str, path:str, **kwargs):
+        client = self._get_client()
+        # Relative paths hang off the FHIR base, absolute ones (paging/export links) are used as is
+        url = path if path.startswith(("http://", "https://")) else f"{self.base_url}/{path.lstrip('/')}"
+        headers = dict(kwargs.pop("headers", None) or {})
+
+        token = await self._token()
+        if not token:
+            return None
+        async with self._semaphore:
+            headers["Authorization"] = f"Bearer {token}"
+            resp = await client.request(method, url, headers=headers, **kwargs)
+            if resp.status_code == 401:
+                self.token_manager.invalidate(token)
+                token = await self._token(stale=token)
+                if not token:
+                    return None
+                headers["Authorization"] = f"Bearer {token}"
+                resp = await client.request(method, url, headers=headers, **kwargs)
+        return resp
+
+    async def get(self, path:str, **kwargs):
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path:str, **kwargs):
+        return await self.request("POST", path, **kwargs)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -0,0 +1,273 @@
+#In-process patient lookup for /get-patient-status.
+#Every Patient is indexed by normalized full name, a phonetic key (for misheard names) and DOB.
+#PatientIndexSync seeds it with a bulk $export (paged search if the server doesn't support export),
+#then polls Patient?_lastUpdated for changes. Lookups that miss still go to Medplum.
+import asyncio
+import json
+import re
+import time
+import unicodedata
+
+
+#Ex: Patient resource -> {"name": "John Smith", "dob": "1980-02-03", "id": "..."}
+def patient_summary(patient:dict):
+    try:
+        name_list = patient.get('name', [{}])[0]
+        first = name_list.get('given', [''])[0]
+        last = name_list.get('family', '')
+        full_name = f"{first} {last}".strip()
+        dob = patient.get('birthDate', 'Unknown')
+        pt_id = patient.get('id', 'Unknown')
+
+        return {
+            "name": full_name,
+            "dob": dob,
+            "id": pt_id
+        }
+    except:
+        return None
+
+#Ex: "  José O'Neil " -> "jose oneil"
+def normalize_name(name:str) -> str:
+    text = unicodedata.normalize("NFKD", str(name)).encode("ascii", "ignore").decode().lower()
+    text = re.sub(r"[^a-z ]", "", text.replace("-", " "))
+    return " ".join(text.split())
+
+_SOUNDEX_CODES = {c: d for d, letters in {
+    "1": "bfpv", "2": "cgjkqsxz", "3": "dt", "4": "l", "5": "mn", "6": "r"
+}.items() for c in letters}
+
+#Classic Soundex per word, ex: "Robert" -> "R163", "Rupert" -> "R163"
+def soundex(word:str) -> str:
+    if not word:
+        return ""
+    code = word[0].upper()
+    last = _SOUNDEX_CODES.get(word[0], "")
+    for c in word[1:]:
+        digit = _SOUNDEX_CODES.get(c, "")
+        if digit and digit != last:
+            code += digit
+            if len(code) == 4:
+                break
+        if c not in "hw":
+            last = digit
+    return code.ljust(4, "0")
+
+def phonetic_key(normalized:str) -> str:
+    return " ".join(soundex(word) for word in normalized.split())
+
+#Name variants a caller might say: "first last" and "first middle last"
+def name_keys(patient:dict) -> set:
+    keys = set()
+    for name in patient.get("name") or []:
+        given = name.get("given") or []
+        family = name.get("family") or ""
+        if given and family:
+            keys.add(normalize_name(f"{given[0]} {family}"))
+            keys.add(normalize_name(" ".join(given + [family])))
+    keys.discard("")
+    return keys
+
+
+class PatientIndex:
+    def __init__(self):
+        self._patients = {} #id -> (summary, name keys)
+        self._by_name = {} #normalized full name -> {ids}
+        self._by_phonetic = {} #phonetic key -> {ids}
+        self._by_dob = {} #dob -> {ids}
+        self.ready = False #seeded at least once
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._patients)
+
+    def _unlink(self, patient_id:str):
+        entry = self._patients.pop(patient_id, None)
+        if entry is None:
+            return
+        summary, keys = entry
+        for key in keys:
+            self._by_name.get(key, set()).discard(patient_id)
+            self._by_phonetic.get(phonetic_key(key), set()).discard(patient_id)
+        self._by_dob.get(summary["dob"], set()).discard(patient_id)
+
+    #Adds or replaces one Patient resource
+    def upsert(self, patient:dict):
+        patient_id = patient.get("id")
+        summary = patient_summary(patient)
+        if not patient_id or summary is None:
+            return
+        self._unlink(patient_id)
+        if not patient.get("active", True):
+            return
+        keys = name_keys(patient)
+        self._patients[patient_id] = (summary, keys)
+        for key in keys:
+            self._by_name.setdefault(key, set()).add(patient_id)
+            self._by_phonetic.setdefault(phonetic_key(key), set()).add(patient_id)
+        self._by_dob.setdefault(summary["dob"], set()).add(patient_id)
+
+    def remove(self, patient_id:str):
+        self._unlink(patient_id)
+
+    #Swaps in a full snapshot (seed/reseed), patients missing from it are dropped
+    def replace_all(self, patients):
+        fresh = PatientIndex()
+        for patient in patients:
+            fresh.upsert(patient)
+        self._patients, self._by_name = fresh._patients, fresh._by_name
+        self._by_phonetic, self._by_dob = fresh._by_phonetic, fresh._by_dob
+        self.ready = True
+
+    #Patients the caller could mean: exact full-name matches (dob narrows them down when given), or
+    #phonetic matches, which only count when the caller gave a dob. More than one = ambiguous
+    def candidates(self, name:str, dob:str=None) -> list:
+        normalized = normalize_name(name)
+        if " " not in normalized:
+            return [] #first name alone isn't enough to pick a patient
+
+        exact = self._by_name.get(normalized, set())
+        similar = set()
+        if dob:
+            on_dob = self._by_dob.get(dob, set())
+            exact = exact & on_dob
+            similar = self._by_phonetic.get(phonetic_key(normalized), set()) & on_dob
+
+        found = exact or similar
+        if len(found) == 1:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return [self._patients[patient_id][0] for patient_id in sorted(found)]
+
+    #The one matching patient's summary, None if there's no match or several
+    def lookup(self, name:str, dob:str=None):
+        found = self.candidates(name, dob)
+        return found[0] if len(found) == 1 else None
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "patients": len(self._patients), "ready": self.ready,
+            "hits": self.hits, "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0
+        }
+
+
+class PatientIndexSync:
+    def __init__(self, index:PatientIndex, fhir_client, poll_interval:float=30.0, reseed_interval:float=6 * 3600,
+                 page_size:int=1000, export_timeout:float=300.0):
+        self.index = index
+        self.fhir_client = fhir_client
+        self.poll_interval = poll_interval
+        self.reseed_interval = reseed_interval #full reload also drops patients deleted upstream
+        self.page_size = page_size
+        self.export_timeout = export_timeout
+        self._since = None #highest meta.lastUpdated seen
+        self._seeded_at = 0.0
+        self._task = None
+
+    def _track(self, patient:dict):
+        updated = (patient.get("meta") or {}).get("lastUpdated")
+        if updated and (self._since is None or updated > self._since):
+            self._since = updated
+
+    #Bulk Data $export: kick off, poll the status url, download the ndjson files. None if unsupported
+    async def _export(self):
+        resp = await self.fhir_client.get(
+            "Patient/$export", params={"_type": "Patient"},
+            headers={"Accept": "application/fhir+json", "Prefer": "respond-async"}
+        )
+        if resp is None or resp.status_code != 202 or "Content-Location" not in resp.headers:
+            return None
+
+        status_url = resp.headers["Content-Location"]
+        deadline = time.monotonic() + self.export_timeout
+        while time.monotonic() < deadline:
+            status = await self.fhir_client.get(status_url)
+            if status is None or status.status_code not in (200, 202):
+                return None
+            if status.status_code == 200:
+                break
+            await asyncio.sleep(float(status.headers.get("Retry-After", "2")))
+        else:
+            print("Patient export timed out, falling back to search")
+            return None
+
+        patients = []
+        for output in status.json().get("output", []):
+            if output.get("type") != "Patient":
+                continue
+            data = await self.fhir_client.get(output["url"], headers={"Accept": "application/fhir+ndjson"})
+            if data is None or data.status_code != 200:
+                return None
+            patients.extend(json.loads(line) for line in data.text.splitlines() if line.strip())
+        return patients
+
+    #Follows Bundle "next" links, returns the resources
+    async def _search_all(self, params:dict) -> list:
+        patients = []
+        resp = await self.fhir_client.get("Patient", params=params)
+        while True:
+            if resp is None or resp.status_code != 200:
+                raise RuntimeError(f"Patient search failed: {'no token' if resp is None else resp.status_code}")
+            bundle = resp.json()
+            patients.extend(e["resource"] for e in bundle.get("entry", []) if "resource" in e)
+            next_url = next((link["url"] for link in bundle.get("link", []) if link.get("relation") == "next"), None)
+            if not next_url:
+                break
+            resp = await self.fhir_client.get(next_url)
+        return patients
+
+    async def seed(self):
+        started = time.monotonic()
+        patients = await self._export()
+        source = "export"
+        if patients is None:
+            patients = await self._search_all({"_count": self.page_size, "_sort": "_lastUpdated"})
+            source = "search"
+        self._since = None
+        for patient in patients:
+            self._track(patient)
+        self.index.replace_all(patients)
+        self._seeded_at = time.monotonic()
+        print(f"Patient index seeded with {len(self.index)} patients via {source} in {self._seeded_at - started:.1f}s")
+
+    #Pulls patients changed since the last sync. "ge" + upsert so same-timestamp updates aren't lost
+    async def poll(self) -> int:
+        if self._since is None:
+            return 0
+        changed = await self._search_all({
+            "_lastUpdated": f"ge{self._since}", "_count": self.page_size, "_sort": "_lastUpdated"
+        })
+        for patient in changed:
+            self.index.upsert(patient)
+            self._track(patient)
+        return len(changed)
+
+    async def _run(self):
+        while True:
+            try:
+                if not self.index.ready or time.monotonic() - self._seeded_at > self.reseed_interval:
+                    await self.seed()
+                else:
+                    await self.poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Patient index sync failed, lookups fall back to Medplum: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,127 @@
+#Rule-based extraction for simple registration instructions, ex: "register John Smith born 1980-02-03".
+#When first name, last name and dob are all unambiguous the patient is created directly, with no LLM
+#round trip. Anything else (middle names, extra requests, no or unclear dates) goes to the registrar agent.
+import datetime
+import re
+import threading
+
+POLITE = r"(?:(?:can|could|would)\s+you\s+)?(?:please\s+)?"
+PATIENT = r"(?:(?:a|the)\s+)?(?:new\s+)?patient\s*[,:]?\s*"
+NAMED = r"(?:(?:named|called|by\s+the\s+name(?:\s+of)?)\s+)?(?:(?:mr|mrs|ms|miss|dr|mx)\.?\s+)?"
+#"register/enroll X" is always about a patient, "add/create X" only counts when it says "patient".
+#"check in" isn't here: it's for patients who already exist, the agent handles it
+LEAD_IN = (
+    rf"{POLITE}(?:(?:register|enroll|enrol|sign\s+up)\s+(?:{PATIENT})?"
+    rf"|(?:add|create)\s+{PATIENT}){NAMED}"
+)
+DOB_WORDS = r"(?:born(?:\s+on)?|dob|d\.o\.b\.?|date\s+of\s+birth|birth\s*date|birthday)"
+NAME_TOKEN = r"[A-Za-z][A-Za-z'\-]*"
+
+_INSTRUCTION_RE = re.compile(
+    rf"^\s*{LEAD_IN}(?P<name>{NAME_TOKEN}(?:\s+{NAME_TOKEN}){{0,4}}?)"
+    rf"\s*(?:,\s*)?(?:(?:who\s+was\s+|with\s+(?:a\s+)?|whose\s+)?{DOB_WORDS}\s*(?:is\s+|of\s+|:\s*)?(?P<dob>.+?))?\s*[.!?]?\s*$",
+    re.IGNORECASE
+)
+_ORDINAL_RE = re.compile(r"(\d{1,2})(?:st|nd|rd|th)\b", re.IGNORECASE)
+_DATE_FORMATS = ("%B %d %Y", "%b %d %Y", "%d %B %Y", "%d %b %Y", "%B %d, %Y", "%b %d, %Y", "%d %B, %Y")
+#Words that show up where the name should be when the instruction isn't a plain registration
+NOT_NAMES = {
+    "a", "an", "the", "new", "patient", "account", "appointment", "record", "me", "him", "her", "them",
+    "this", "that", "my", "for", "to", "and", "with", "who", "born", "dob",
+    # Trailing filler that would otherwise be read as a last name, ex: "register John please"
+    "please", "thanks", "thank", "today", "tomorrow", "now", "asap", "again", "too", "also", "here", "quickly"
+}
+
+#Returns "YYYY-MM-DD" or None if the text isn't one clear date
+def parse_dob(text:str):
+    text = " ".join(_ORDINAL_RE.sub(r"\1", text.replace(" of ", " ")).replace(".", " ").split())
+
+    iso = re.fullmatch(r"(\d{4})-(\d{1,2})-(\d{1,2})", text)
+    slash = re.fullmatch(r"(\d{1,2})[/-](\d{1,2})[/-](\d{4})", text)
+    parsed = None
+    try:
+        if iso:
+            parsed = datetime.date(int(iso[1]), int(iso[2]), int(iso[3]))
+        elif slash:
+            first, second = int(slash[1]), int(slash[2])
+            if first <= 12 and second <= 12 and first != second:
+                return None #03/04/1980 could be March 4 or April 3
+            month, day = (first, second) if first <= 12 else (second, first)
+            parsed = datetime.date(int(slash[3]), month, day)
+        else:
+            for fmt in _DATE_FORMATS:
+                try:
+                    parsed = datetime.datetime.strptime(text, fmt).date()
+                    break
+                except ValueError:
+                    continue
+    except ValueError:
+        return None
+
+    if parsed is None or not (1900 <= parsed.year and parsed <= datetime.date.today()):
+        return None
+    return parsed.isoformat()
+
+#Returns {"first_name", "last_name", "dob"} when the instruction is unambiguous, otherwise None
+def parse_registration(instruction:str):
+    if not instruction:
+        return None
+    match = _INSTRUCTION_RE.match(instruction)
+    if not match:
+        return None
+
+    tokens = match["name"].split()
+    if len(tokens) != 2:
+        return None #middle names, "and", extra words... let the agent decide
+    if any(t.lower() in NOT_NAMES for t in tokens):
+        return None
+    if not all(t.islower() for t in tokens) and not all(t[0].isupper() for t in tokens):
+        return None #"register Smith today": a typed instruction capitalizes both names
+
+    if not match["dob"]:
+        return None #no dob given, left to the registrar agent
+    dob = parse_dob(match["dob"])
+    if dob is None:
+        return None
+
+    first, last = (t[:1].upper() + t[1:] if t.islower() else t for t in tokens)
+    return {"first_name": first, "last_name": last, "dob": dob}
+
+
+class FastPathStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.fast_path = 0
+        self.fallbacks = 0
+        self.fast_seconds = 0.0
+        self.agent_seconds = 0.0
+        self.agent_tokens = 0 #prompt + completion tokens used by agent runs
+
+    def record_fast(self, seconds:float):
+        with self._lock:
+            self.fast_path += 1
+            self.fast_seconds += seconds
+
+    def record_agent(self, seconds:float, tokens:int=0):
+        with self._lock:
+            self.fallbacks += 1
+            self.agent_seconds += seconds
+            self.agent_tokens += tokens
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            total = self.fast_path + self.fallbacks
+            avg_fast = self.fast_seconds / self.fast_path if self.fast_path else 0.0
+            avg_agent = self.agent_seconds / self.fallbacks if self.fallbacks else 0.0
+            avg_tokens = self.agent_tokens / self.fallbacks if self.fallbacks else 0.0
+            return {
+                "requests": total,
+                "fast_path": self.fast_path,
+                "fallbacks": self.fallbacks,
+                "hit_rate": round(self.fast_path / total, 3) if total else 0.0,
+                "avg_fast_ms": round(avg_fast * 1000, 1),
+                "avg_agent_ms": round(avg_agent * 1000, 1),
+                # Estimates: what the fast-path requests would have cost through the agent
+                "est_seconds_saved": round(self.fast_path * max(avg_agent - avg_fast, 0.0), 1),
+                "est_tokens_saved": int(self.fast_path * avg_tokens)
+            }
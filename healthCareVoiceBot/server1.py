@@ -1,9 +1,21 @@
+import os
 import uvicorn
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
-from ehr_project.tools import check_patient_db
-from ehr_project.agents import run_admin_agent
+from ehr_project.tools import NEEDS_DOB, PATIENT_INDEX_ENABLED, find_patient, fhir_client, patient_index_sync
+from ehr_project.agents import model_client, registrar_pool, registration_stats, run_registration
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if PATIENT_INDEX_ENABLED:
+        patient_index_sync.start()
+    registrar_pool.fill(int(os.getenv("REGISTRAR_POOL_WARM", "1")))
+    yield
+    await patient_index_sync.stop()
+    await model_client.close()
+    await fhir_client.aclose()
+
+app = FastAPI(lifespan=lifespan)
 
 @app.post("/get-patient-status")
 async def handle_fast_check(request: Request):
@@ -11,14 +23,17 @@ async def handle_fast_check(request: Request):
     payload = await request.json()
     args = payload.get("args", {})
     full_name = args.get("patient_name")
+    dob = args.get("dob")
     
     if not full_name: 
         return {"result": "I didn't catch the name."}
 
    
     print(f"Checking {full_name}")
-    result = check_patient_db(full_name)
+    result = await find_patient(full_name, dob)
     
+    if result == NEEDS_DOB:
+        return {"result": f"I found more than one patient named {full_name}. Can you confirm the date of birth?"}
     if result:
         return {"result": f"I found {result['name']}, born {result['dob']}."}
     else:
@@ -37,12 +52,17 @@ async def handle_agent_request(request: Request):
         return {"result": "No instruction provided"}
     
     try:
-        agent_response = await run_admin_agent(instruction)
+        agent_response = await run_registration(instruction)
         return {"result": agent_response}
         
     except Exception as e:
         print(f"Agent Error: {e}")
         return {"result": "I'm having trouble connecting to the registrar."}
 
+#Fast-path hit rate and estimated latency/token savings for registrations
+@app.get("/consult-agent/stats")
+async def registration_metrics():
+    return {"registration": registration_stats.snapshot(), "registrar_pool": registrar_pool.stats()}
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
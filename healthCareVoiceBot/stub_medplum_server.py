@@ -0,0 +1,143 @@
+#Local stand-in for Medplum's token endpoint and the FHIR Patient resource, for tests and load runs.
+#Point the bot at it with MEDPLUM_TOKEN_URL=http://127.0.0.1:<port>/oauth2/token and
+#MEDPLUM_FHIR_URL=http://127.0.0.1:<port>/fhir/R4. Only tokens it issued (and didn't revoke) are accepted.
+#Run standalone: python stub_medplum_server.py --port 8766 --expires-in 3600
+import argparse
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class StubMedplum:
+    def __init__(self, expires_in:int=3600, latency:float=0.0):
+        self.expires_in = expires_in
+        self.latency = latency
+        self.tokens = set()
+        self.patients = []
+        self.token_requests = 0
+        self.fhir_requests = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def issue_token(self) -> str:
+        with self._lock:
+            self.token_requests += 1
+            token = f"stub-token-{self.token_requests}"
+            self.tokens.add(token)
+        return token
+
+    #Makes every issued token invalid, next FHIR call gets a 401
+    def revoke_all(self):
+        with self._lock:
+            self.tokens.clear()
+
+    def add_patient(self, first_name:str, last_name:str, dob:str) -> dict:
+        with self._lock:
+            patient = {
+                "resourceType": "Patient",
+                "id": f"stub-{next(self._ids)}",
+                "meta": {"lastUpdated": time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime())},
+                "name": [{"use": "official", "given": [first_name], "family": last_name}],
+                "birthDate": dob
+            }
+            self.patients.append(patient)
+        return patient
+
+    def search(self, params:dict) -> list:
+        term = (params.get("name:contains") or [""])[0].lower()
+        since = (params.get("_lastUpdated") or [""])[0].removeprefix("ge")
+        result = []
+        for patient in list(self.patients):
+            if since and patient["meta"]["lastUpdated"] < since:
+                continue
+            name = patient["name"][0]
+            full = " ".join(name.get("given", []) + [name.get("family", "")]).lower()
+            if term in full:
+                result.append(patient)
+        return result
+
+
+def make_handler(stub:StubMedplum):
+    class StubMedplumHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1" #keep-alive, like the real server
+
+        def _send(self, status:int, payload:dict):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/fhir+json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _body(self) -> bytes:
+            return self.rfile.read(int(self.headers.get("Content-Length", 0)) or 0)
+
+        def _authorized(self) -> bool:
+            token = self.headers.get("Authorization", "").removeprefix("Bearer ")
+            with stub._lock:
+                stub.fhir_requests += 1
+                ok = token in stub.tokens
+            if not ok:
+                self._send(401, {"resourceType": "OperationOutcome", "issue": [{"code": "login"}]})
+            return ok
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            body = self._body()
+            if stub.latency:
+                time.sleep(stub.latency)
+            if url.path.endswith("/oauth2/token"):
+                self._send(200, {"access_token": stub.issue_token(), "token_type": "Bearer", "expires_in": stub.expires_in})
+            elif url.path.endswith("/Patient"):
+                if not self._authorized():
+                    return
+                data = json.loads(body or b"{}")
+                name = (data.get("name") or [{}])[0]
+                patient = stub.add_patient((name.get("given") or [""])[0], name.get("family", ""), data.get("birthDate", ""))
+                self._send(201, patient)
+            else:
+                self._send(404, {})
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if stub.latency:
+                time.sleep(stub.latency)
+            if not url.path.endswith("/Patient"):
+                self._send(404, {})
+                return
+            if not self._authorized():
+                return
+            matches = stub.search(parse_qs(url.query))
+            self._send(200, {
+                "resourceType": "Bundle", "type": "searchset", "total": len(matches),
+                "entry": [{"resource": p} for p in matches]
+            })
+
+        def log_message(self, *args):
+            pass
+
+    return StubMedplumHandler
+
+#Starts the stub on a daemon thread, returns (server, stub). server.server_address has the port
+def start_stub_server(port:int=0, expires_in:int=3600, latency:float=0.0):
+    stub = StubMedplum(expires_in, latency)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(stub))
+    threading.Thread(target=server.serve_forever, name="stub-medplum", daemon=True).start()
+    return server, stub
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--expires-in", type=int, default=3600)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per response")
+    args = parser.parse_args()
+    server, _ = start_stub_server(args.port, args.expires_in, args.latency)
+    print(f"Stub Medplum server on http://127.0.0.1:{server.server_address[1]}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,53 @@
+import pytest
+
+from registration_parser import parse_dob, parse_registration
+
+
+@pytest.mark.parametrize("instruction, expected", [
+    ("register John Smith born 1980-02-03", ("John", "Smith", "1980-02-03")),
+    ("Please register patient Jane Doe, date of birth March 4th 1975", ("Jane", "Doe", "1975-03-04")),
+    ("can you enroll a new patient named Ana Lopez dob 12/31/1990.", ("Ana", "Lopez", "1990-12-31")),
+    ("add patient O'Neil Brown born on 5 June 2001", ("O'Neil", "Brown", "2001-06-05")),
+    ("register john smith born 1980-02-03", ("John", "Smith", "1980-02-03")),
+])
+def test_parses_plain_registrations(instruction, expected):
+    parsed = parse_registration(instruction)
+    assert (parsed["first_name"], parsed["last_name"], parsed["dob"]) == expected
+
+
+@pytest.mark.parametrize("instruction", [
+    # Filler words read as a last name
+    "Register John please",
+    "register Smith today",
+    "register John Smith please born 1980-02-03",
+    # Existing patients, not registrations
+    "check in patient John Smith",
+    "check in patient John Smith born 1980-02-03",
+    # No dob: the agent decides, the fast path doesn't invent one
+    "register John Smith",
+    # Mixed capitalization
+    "register John smith born 1980-02-03",
+    # Middle names, several patients, other requests
+    "register John Paul Smith born 1980-02-03",
+    "register John Smith and Jane Doe born 1980-02-03",
+    "create an appointment for John Smith",
+    "add John Smith born 1980-02-03",
+    # Unclear or impossible dates
+    "register John Smith born 03/04/1980",
+    "register John Smith born 2999-01-01",
+    "register John Smith born last spring",
+    "",
+])
+def test_leaves_other_instructions_to_the_agent(instruction):
+    assert parse_registration(instruction) is None
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("1980-02-03", "1980-02-03"),
+    ("13/04/1980", "1980-04-13"),
+    ("04/04/1980", "1980-04-04"),
+    ("February 3rd, 1980", "1980-02-03"),
+    ("02/30/1980", None),
+])
+def test_parse_dob(text, expected):
+    assert parse_dob(text) == expected
@@ -0,0 +1,83 @@
+#Caches the Medplum client-credentials token so FHIR calls don't pay an OAuth round trip each time.
+#   fresh token                      -> returned as is
+#   within refresh_margin of expiry  -> still returned, a background thread fetches the next one
+#   missing/expired/rejected (401)   -> fetched inline; concurrent callers wait on the same fetch
+import threading
+import time
+
+import requests
+
+
+class TokenManager:
+    def __init__(self, token_url:str, client_id:str, client_secret:str, refresh_margin:float=60.0, timeout:float=10.0):
+        self.token_url = token_url
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.refresh_margin = refresh_margin
+        self.timeout = timeout
+
+        self._session = requests.Session() #keeps the connection to the token endpoint open
+        self._lock = threading.Lock() #one fetch at a time, everyone else reuses its result
+        self._token = None
+        self._expires_at = 0.0 #time.monotonic() deadline
+        self._background = None
+        self._background_lock = threading.Lock()
+        self.fetches = 0
+
+    def _fetch(self):
+        response = self._session.post(
+            self.token_url,
+            auth=(self.client_id, self.client_secret),
+            data={"grant_type": "client_credentials"},
+            timeout=self.timeout
+        )
+        if response.status_code != 200:
+            print(f"Auth failed: {response.text}")
+            return None
+        data = response.json()
+        self.fetches += 1
+        return data.get("access_token"), time.monotonic() + float(data.get("expires_in", 3600))
+
+    def get_token(self):
+        return self.cached_token() or self.refresh(stale=self._token)
+
+    #Same as get_token but never blocks on the token endpoint, None means a fetch is needed (async callers)
+    def cached_token(self):
+        token, expires_at = self._token, self._expires_at
+        now = time.monotonic()
+        if token and now < expires_at - self.refresh_margin:
+            return token
+        if token and now < expires_at:
+            self._refresh_in_background(token)
+            return token
+        return None
+
+    #Fetches a new token unless another thread already replaced `stale` while we waited for the lock
+    def refresh(self, stale=None):
+        with self._lock:
+            if self._token and self._token != stale and time.monotonic() < self._expires_at:
+                return self._token
+            try:
+                fetched = self._fetch()
+            except requests.RequestException as e:
+                print(f"Auth failed: {e}")
+                fetched = None
+            if fetched is None:
+                # Keep serving the old token while it's still valid, the next call tries again
+                return self._token if self._token and time.monotonic() < self._expires_at else None
+            self._token, self._expires_at = fetched
+            return self._token
+
+    def _refresh_in_background(self, stale):
+        with self._background_lock:
+            if self._background is not None and self._background.is_alive():
+                return
+            self._background = threading.Thread(target=self.refresh, args=(stale,), name="medplum-token", daemon=True)
+            self._background.start()
+
+    #Server rejected `token` (401), drop it so the next get_token fetches a new one
+    def invalidate(self, token):
+        with self._lock:
+            if self._token == token:
+                self._token = None
+                self._expires_at = 0.0
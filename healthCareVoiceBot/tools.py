@@ -1,75 +1,69 @@
 import os
+import httpx
 import requests
 from dotenv import load_dotenv
+from ehr_project.fhir_client import FhirClient
+from ehr_project.patient_index import PatientIndex, PatientIndexSync, name_keys, normalize_name, patient_summary
+from ehr_project.token_manager import TokenManager
 
 load_dotenv()
 
 MEDPLUM_CLIENT_ID = os.getenv("MEDPLUM_CLIENT_ID")
 MEDPLUM_CLIENT_SECRET = os.getenv("MEDPLUM_CLIENT_SECRET")
 
-MEDPLUM_TOKEN_URL = "https://api.medplum.com/oauth2/token"
-MEDPLUM_FHIR_URL = "https://api.medplum.com/fhir/R4"
+MEDPLUM_TOKEN_URL = os.getenv("MEDPLUM_TOKEN_URL", "https://api.medplum.com/oauth2/token")
+MEDPLUM_FHIR_URL = os.getenv("MEDPLUM_FHIR_URL", "https://api.medplum.com/fhir/R4")
+
+#Token is cached and refreshed ahead of expiry, see token_manager.py
+token_manager = TokenManager(
+    MEDPLUM_TOKEN_URL, MEDPLUM_CLIENT_ID, MEDPLUM_CLIENT_SECRET,
+    refresh_margin=float(os.getenv("MEDPLUM_TOKEN_REFRESH_MARGIN", "60"))
+)
 
 def get_medplum_token():  
-    response = requests.post(
-        MEDPLUM_TOKEN_URL,
-        auth = (MEDPLUM_CLIENT_ID, MEDPLUM_CLIENT_SECRET),
-        data={"grant_type":"client_credentials"}
-    )
-    if response.status_code!=200:
-        print(f"Auth failed: {response.text}")
-        return None
-    return response.json().get("access_token")
+    return token_manager.get_token()
 
-def check_patient_db(name:str)->str:
-    print(f"Searching Medplum for '{name}'...")
-    
+#Sends an authorized FHIR request, a 401 (token revoked/expired early) gets one retry with a new token
+def medplum_request(method:str, url:str, headers:dict=None, **kwargs):
     token = get_medplum_token()
-    if not token: return None
-    
-    headers = {"Authorization": f"Bearer {token}"}
-    search_term = name.split(" ")[0]
-    
-    url = f"{MEDPLUM_FHIR_URL}/Patient?name:contains={search_term}"
-    resp = requests.get(url, headers=headers)
-    entries = resp.json().get("entry", [])
-   
-    if len(entries) > 0:
-        patient = entries[0]["resource"]
-        
-        try:
-            name_list = patient.get('name', [{}])[0]
-            first = name_list.get('given', [''])[0]
-            last = name_list.get('family', '')
-            full_name = f"{first} {last}".strip()
-            dob = patient.get('birthDate', 'Unknown')
-            pt_id = patient.get('id', 'Unknown')
-            
-            return {
-                "name": full_name,
-                "dob": dob,
-                "id": pt_id
-            }
-        except:
-            return None
-    else:
-        print(f"NOT FOUND: {name}")
+    if not token:
         return None
+    headers = dict(headers or {})
+    headers["Authorization"] = f"Bearer {token}"
+    resp = requests.request(method, url, headers=headers, **kwargs)
+    if resp.status_code == 401:
+        token_manager.invalidate(token)
+        token = get_medplum_token()
+        if not token:
+            return None
+        headers["Authorization"] = f"Bearer {token}"
+        resp = requests.request(method, url, headers=headers, **kwargs)
+    return resp
 
-def create_patient_db(first_name:str, last_name:str, dob:str) ->str:
-    
-    print(f"Creating patient:'{first_name} {last_name} with dob: {dob}")
-    
-    token = get_medplum_token()
-    if not token:
-        return "ERROR_AUTH"
-    
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Content-Type": "application/json"
-    }
-    
-    payload = {
+def _search_path(name:str) -> str:
+    search_term = name.split(" ")[0]
+    return f"Patient?name:contains={search_term}"
+
+NEEDS_DOB = "NEEDS_DOB" #several patients have that name, the caller has to confirm the date of birth
+
+#The search only narrows by the first name, so every entry is checked against the full name (and dob)
+def _first_match(name:str, bundle:dict, dob:str=None):
+    wanted = normalize_name(name)
+    matches = [
+        entry["resource"] for entry in bundle.get("entry", [])
+        if "resource" in entry and wanted in name_keys(entry["resource"])
+        and (not dob or entry["resource"].get("birthDate") == dob)
+    ]
+    if len(matches) == 1:
+        return patient_summary(matches[0])
+    if len(matches) > 1:
+        print(f"AMBIGUOUS: {len(matches)} patients named {name}")
+        return NEEDS_DOB
+    print(f"NOT FOUND: {name}")
+    return None
+
+def _patient_resource(first_name:str, last_name:str, dob:str) -> dict:
+    return {
         "resourceType": "Patient",
         "name": [
             {
@@ -80,14 +74,87 @@ def create_patient_db(first_name:str, last_name:str, dob:str) ->str:
         ],
         "birthDate": dob
     }
+
+def _create_result(first_name:str, last_name:str, resp) -> str:
+    if resp is None:
+        return "ERROR_AUTH"
+    if resp.status_code == 201:
+        return f"Success: Registered {first_name} {last_name}."
+    return f"Failed: Medplum returned {resp.status_code} - {resp.text}"
+
+def check_patient_db(name:str, dob:str=None)->str:
+    print(f"Searching Medplum for '{name}'...")
+    
+    resp = medplum_request("GET", f"{MEDPLUM_FHIR_URL}/{_search_path(name)}")
+    if resp is None: return None
+    return _first_match(name, resp.json(), dob)
+
+def create_patient_db(first_name:str, last_name:str, dob:str) ->str:
+    
+    print(f"Creating patient:'{first_name} {last_name} with dob: {dob}")
+    
+    headers = {
+        "Content-Type": "application/json"
+    }
+    payload = _patient_resource(first_name, last_name, dob)
     
     try:
-        resp = requests.post(f"{MEDPLUM_FHIR_URL}/Patient", json=payload, headers=headers)
-        
-        if resp.status_code == 201:
-            return f"Success: Registered {first_name} {last_name}."
-        else:
-            return f"Failed: Medplum returned {resp.status_code} - {resp.text}"
+        resp = medplum_request("POST", f"{MEDPLUM_FHIR_URL}/Patient", json=payload, headers=headers)
+        return _create_result(first_name, last_name, resp)
             
     except Exception as e:
-        return f"Failed: Connection error {str(e)}"
\ No newline at end of file
+        return f"Failed: Connection error {str(e)}"
+
+
+#Async versions for the FastAPI handlers and the agent: pooled connections, no blocked event loop
+fhir_client = FhirClient(
+    MEDPLUM_FHIR_URL, token_manager,
+    timeout=float(os.getenv("MEDPLUM_TIMEOUT", "10")),
+    max_connections=int(os.getenv("MEDPLUM_MAX_CONNECTIONS", "20")),
+    concurrency=int(os.getenv("MEDPLUM_CONCURRENCY", "20"))
+)
+
+async def check_patient_db_async(name:str, dob:str=None):
+    print(f"Searching Medplum for '{name}'...")
+    
+    try:
+        resp = await fhir_client.get(_search_path(name))
+    except httpx.HTTPError as e:
+        print(f"Medplum search failed: {e}")
+        return None
+    if resp is None: return None
+    return _first_match(name, resp.json(), dob)
+
+async def create_patient_db_async(first_name:str, last_name:str, dob:str) ->str:
+    
+    print(f"Creating patient:'{first_name} {last_name} with dob: {dob}")
+    
+    try:
+        resp = await fhir_client.post("Patient", json=_patient_resource(first_name, last_name, dob),
+                                      headers={"Content-Type": "application/json"})
+        if resp is not None and resp.status_code == 201:
+            patient_index.upsert(resp.json()) #known right away, no need to wait for the next poll
+        return _create_result(first_name, last_name, resp)
+    except httpx.HTTPError as e:
+        return f"Failed: Connection error {str(e)}"
+
+
+#Local index for /get-patient-status, see patient_index.py
+patient_index = PatientIndex()
+patient_index_sync = PatientIndexSync(
+    patient_index, fhir_client,
+    poll_interval=float(os.getenv("PATIENT_INDEX_POLL_INTERVAL", "30")),
+    reseed_interval=float(os.getenv("PATIENT_INDEX_RESEED_INTERVAL", str(6 * 3600)))
+)
+PATIENT_INDEX_ENABLED = os.getenv("PATIENT_INDEX", "1") == "1"
+
+#Answers from the local index when it knows the patient. Several patients with that name -> NEEDS_DOB.
+#No match goes to Medplum (registered since the last poll), same full-name/dob check on its results
+async def find_patient(name:str, dob:str=None):
+    if PATIENT_INDEX_ENABLED and patient_index.ready:
+        found = patient_index.candidates(name, dob)
+        if len(found) == 1:
+            return found[0]
+        if len(found) > 1:
+            return NEEDS_DOB
+    return await check_patient_db_async(name, dob)
@@ -0,0 +1,132 @@
+#In-process ledger of bookings made by this server that the event mirror may not show yet.
+#book_appointment reserves the slot here before writing to the calendar: the overlap check runs
+#against the mirrored events plus every pending/just-confirmed booking, under a lock per calendar
+#day (in the calendar timezone), so two concurrent callers can't both get the same slot.
+#Entries are dropped once a sync shows the event on the calendar, or hold_seconds after the write
+#(reserve() expires them itself, so this works without the mirror too).
+import contextlib
+import datetime
+import itertools
+import threading
+import time
+
+
+def _days(start:datetime.datetime, end:datetime.datetime) -> list:
+    last = (end - datetime.timedelta(microseconds=1)).date() if end > start else start.date()
+    day = start.date()
+    days = []
+    while day <= last:
+        days.append(day)
+        day += datetime.timedelta(days=1)
+    return days
+
+
+class BookingConflict(Exception):
+    def __init__(self, event:dict):
+        super().__init__(f"Slot overlaps {event.get('summary')}")
+        self.event = event
+
+
+class BookingLedger:
+    def __init__(self, hold_seconds:float=300.0, lock_stripes:int=64):
+        self.hold_seconds = hold_seconds
+        self._ids = itertools.count(1)
+        # Fixed set of locks, a day uses locks[day.toordinal() % lock_stripes], so nothing grows per day
+        self._locks = [threading.Lock() for _ in range(lock_stripes)]
+        self._by_day = {} #date -> {booking id: entry}
+
+    def _stripe(self, day) -> int:
+        return day.toordinal() % len(self._locks)
+
+    def _day_lock(self, day) -> threading.Lock:
+        return self._locks[self._stripe(day)]
+
+    #Holds the locks for every day the slot touches, always in stripe order so two bookings can't deadlock
+    def _locked(self, days):
+        stack = contextlib.ExitStack()
+        for stripe in sorted({self._stripe(day) for day in days}):
+            stack.enter_context(self._locks[stripe])
+        return stack
+
+    #Caller holds the day's lock. Drops confirmed bookings older than hold_seconds: by then a sync
+    #shows them (or they were cancelled on the calendar and the slot should open up again)
+    def _expire_day(self, day, now:float):
+        entries = self._by_day.get(day)
+        if entries is None:
+            return
+        for booking_id, entry in list(entries.items()):
+            if entry["status"] == "confirmed" and now - entry["created_at"] > self.hold_seconds:
+                entries.pop(booking_id)
+        if not entries:
+            self._by_day.pop(day, None)
+
+    #Sweeps every day, for when nothing reconciles against the calendar (no mirror)
+    def expire(self):
+        now = time.monotonic()
+        for day in list(self._by_day):
+            with self._day_lock(day):
+                self._expire_day(day, now)
+
+    #Reserves [start, end) or raises BookingConflict. `busy` = events already on the calendar for that range
+    def reserve(self, start:datetime.datetime, end:datetime.datetime, summary:str, busy:list) -> int:
+        for event in busy:
+            if event["start"] < end and event["end"] > start:
+                raise BookingConflict(event)
+
+        days = _days(start, end)
+        now = time.monotonic()
+        with self._locked(days):
+            for day in days:
+                self._expire_day(day, now)
+                for entry in self._by_day.get(day, {}).values():
+                    if entry["start"] < end and entry["end"] > start:
+                        raise BookingConflict(entry)
+
+            booking_id = next(self._ids)
+            entry = {
+                "summary": summary, "start": start, "end": end,
+                "start_label": start.strftime('%H:%M'), "end_label": end.strftime('%H:%M'),
+                "status": "pending", "uid": None, "created_at": now
+            }
+            for day in days:
+                self._by_day.setdefault(day, {})[booking_id] = entry
+            return booking_id
+
+    #Calendar write succeeded, keep blocking the slot until a sync shows the event
+    def confirm(self, booking_id:int, uid:str):
+        for entries in list(self._by_day.values()):
+            entry = entries.get(booking_id)
+            if entry is not None:
+                entry.update(status="confirmed", uid=uid, created_at=time.monotonic())
+                return
+
+    #Calendar write failed, free the slot
+    def release(self, booking_id:int):
+        for day in list(self._by_day):
+            with self._day_lock(day):
+                self._by_day.get(day, {}).pop(booking_id, None)
+
+    #Drops confirmed bookings the calendar now shows (lookup(start, end) -> events) and stale ones,
+    #returns [(booking, other event)] for overlaps that came from outside this server
+    def reconcile(self, lookup) -> list:
+        now = time.monotonic()
+        conflicts = []
+        for day in list(self._by_day):
+            with self._day_lock(day):
+                entries = self._by_day.get(day, {})
+                for booking_id, entry in list(entries.items()):
+                    if entry["status"] != "confirmed":
+                        continue
+                    events = lookup(entry["start"], entry["end"])
+                    if any(e["uid"] == entry["uid"] for e in events):
+                        conflicts.extend(
+                            (entry, e) for e in events
+                            if e["uid"] != entry["uid"] and e["start"] < entry["end"] and e["end"] > entry["start"]
+                        )
+                        entries.pop(booking_id)
+                self._expire_day(day, now)
+        return conflicts
+
+    def pending(self) -> int:
+        return len({booking_id for entries in self._by_day.values() for booking_id in entries})
+
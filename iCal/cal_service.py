@@ -1,20 +1,78 @@
 import os
+import asyncio
 import datetime
+import functools
+import threading
+import time
 import caldav
 from caldav.elements import dav
+from caldav.lib import error
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from zoneinfo import ZoneInfo
+
+from booking_ledger import BookingConflict, BookingLedger
+from event_mirror import EventMirror, event_record, to_datetime
+from free_busy import BusyIntervals, WorkingHours, group_by_day, open_slots
 
 load_dotenv()
 ICLOUD_USERNAME = os.getenv("ICLOUD_USERNAME")
 ICLOUD_APP_SPECIFIC_PASSWORD = os.getenv("ICLOUD_APP_SPECIFIC_PASSWORD")
 
-#Returns primary cal
-def get_calendar():
-    client = caldav.DAVClient(
-        url="https://caldav.icloud.com/",
-        username=ICLOUD_USERNAME,
-        password=ICLOUD_APP_SPECIFIC_PASSWORD
-    )
+CALDAV_URL = "https://caldav.icloud.com/"
+CALENDAR_CACHE_TTL = float(os.getenv("CALENDAR_CACHE_TTL", "3600")) #seconds before rediscovering calendars
+CALDAV_TIMEOUT = float(os.getenv("CALDAV_TIMEOUT", "15")) #seconds, per tool call
+CALDAV_MAX_WORKERS = int(os.getenv("CALDAV_MAX_WORKERS", "16")) #threads shared by all calendar calls
+CALDAV_CALENDAR_CONCURRENCY = int(os.getenv("CALDAV_CALENDAR_CONCURRENCY", "4")) #in-flight calls per calendar
+CALENDAR_MIRROR = os.getenv("CALENDAR_MIRROR", "1") == "1" #answer availability from the local event mirror
+CALENDAR_MIRROR_DAYS = int(os.getenv("CALENDAR_MIRROR_DAYS", "60")) #how far ahead recurring events are expanded
+CALENDAR_SYNC_INTERVAL = float(os.getenv("CALENDAR_SYNC_INTERVAL", "10")) #seconds between change checks
+WORKING_HOURS = WorkingHours.from_strings(
+    os.getenv("WORKING_HOURS_START", "09:00"),
+    os.getenv("WORKING_HOURS_END", "17:00"),
+    os.getenv("WORKING_DAYS", "0-4") #0 = Monday
+)
+MAX_SLOT_SEARCH_DAYS = int(os.getenv("MAX_SLOT_SEARCH_DAYS", "31"))
+SLOT_STEP_MINUTES = 15 #open slots today start on a quarter hour, not at the current minute
+
+#Naive times (dates asked about, floating events) are read in CALENDAR_TZ, an IANA name (ex: America/Chicago).
+#Without it the system zone is used, as a real zone with its DST rules, never the current UTC offset
+#(that would put naive times an hour off after a DST change)
+def _calendar_timezone():
+    name = os.getenv("CALENDAR_TZ") or os.getenv("TZ", "").lstrip(":")
+    if name:
+        return ZoneInfo(name)
+    try:
+        with open("/etc/timezone", encoding="utf-8") as f:
+            return ZoneInfo(f.read().strip())
+    except (OSError, ValueError, KeyError):
+        pass
+    try:
+        with open("/etc/localtime", "rb") as f:
+            return ZoneInfo.from_file(f, key="localtime")
+    except (OSError, ValueError):
+        raise RuntimeError("Set CALENDAR_TZ to the calendar's IANA time zone, ex: America/Chicago")
+
+CALENDAR_TZ = _calendar_timezone()
+
+# One long-lived client (its HTTP session keeps connections to iCloud open) + the selected calendar
+_client = None
+_calendar_cache = {"calendar": None, "url": None, "names": {}, "expires_at": 0.0}
+_cache_lock = threading.Lock()
+
+def get_client() -> caldav.DAVClient:
+    global _client
+    if _client is None:
+        _client = caldav.DAVClient(
+            url=CALDAV_URL,
+            username=ICLOUD_USERNAME,
+            password=ICLOUD_APP_SPECIFIC_PASSWORD,
+            timeout=int(CALDAV_TIMEOUT)
+        )
+    return _client
+
+#Principal discovery + picks the primary cal, returns (calendar, {display name: calendar url})
+def _discover_calendar(client):
     principal = client.principal()
     calendars = principal.calendars()
     
@@ -77,80 +135,302 @@ def get_calendar():
         selected_cal = calendars[0]
     
     print(f"Selected calendar object: {selected_cal}")
-    return selected_cal
+    return selected_cal, {name: str(cal.url) for name, cal in cal_map.items()}
+
+#Returns primary cal, discovery only runs on a cold cache, after CALENDAR_CACHE_TTL or when forced
+def get_calendar(refresh: bool = False):
+    with _cache_lock:
+        if not refresh and _calendar_cache["calendar"] is not None and time.monotonic() < _calendar_cache["expires_at"]:
+            return _calendar_cache["calendar"]
+
+        calendar, names = _discover_calendar(get_client())
+        _calendar_cache.update(
+            calendar=calendar,
+            url=str(calendar.url),
+            names=names,
+            expires_at=time.monotonic() + CALENDAR_CACHE_TTL
+        )
+        return calendar
+
+#Drops the cached calendar (and the client too, after auth errors) so the next call rediscovers
+def invalidate_calendar(reset_client: bool = False):
+    global _client
+    with _cache_lock:
+        _calendar_cache.update(calendar=None, url=None, names={}, expires_at=0.0)
+        if reset_client:
+            _client = None
+
+#Runs fn(calendar), retrying once with a fresh discovery if the cached calendar is gone or auth expired
+def with_calendar(fn):
+    calendar = get_calendar()
+    try:
+        return fn(calendar)
+    except (error.NotFoundError, error.AuthorizationError) as e:
+        print(f"Calendar request failed ({type(e).__name__}), rediscovering calendar and retrying")
+        invalidate_calendar(reset_client=isinstance(e, error.AuthorizationError))
+        return fn(get_calendar())
+
+event_mirror = EventMirror(get_calendar, CALENDAR_TZ, CALENDAR_MIRROR_DAYS, CALENDAR_SYNC_INTERVAL)
+booking_ledger = BookingLedger(hold_seconds=float(os.getenv("BOOKING_HOLD_SECONDS", "300")))
+
+#Event records overlapping [start, end). Served from the local mirror when it covers the range,
+#otherwise (mirror off, range outside the window or sync failing) one expanded search on the server
+def fetch_events(start: datetime.datetime, end: datetime.datetime) -> list:
+    if CALENDAR_MIRROR:
+        try:
+            event_mirror.refresh_if_stale()
+            if event_mirror.covers(start, end):
+                return event_mirror.events_between(start, end)
+        except Exception as e:
+            print(f"Calendar mirror unavailable, searching the server: {e}")
+
+    return _search_events(start, end)
+
+#One remote search, expanded occurrences as event records
+def _search_events(start: datetime.datetime, end: datetime.datetime) -> list:
+    events = with_calendar(lambda calendar: calendar.search(
+        start=start, end=end - datetime.timedelta(microseconds=1),
+        event=True, expand=True
+    ))
+    return [event_record(event.icalendar_component, CALENDAR_TZ) for event in events]
+
+#Ex: "2026-01-05" or "2026-01-05T10:00:00" -> date(2026, 1, 5), raises ValueError otherwise
+def _parse_date(date: str) -> datetime.date:
+    # Handle potential ISO format with time included by stripping it
+    if "T" in date:
+        date = date.split("T")[0]
+    return datetime.datetime.strptime(date, "%Y-%m-%d").date()
 
 #Returns all events on given date
 def check_availability(date: str) -> str:
     if not date:
         return "Error: Date is required."
         
-    calendar = get_calendar()
     try:
-        # Handle potential ISO format with time included by stripping it
-        if "T" in date:
-            date = date.split("T")[0]
-            
-        query_date = datetime.datetime.strptime(date, "%Y-%m-%d").date()
+        query_date = _parse_date(date)
     except ValueError:
         return "Invalid date format. Please use YYYY-MM-DD."
 
-    events = calendar.search(
-        start=datetime.datetime.combine(query_date, datetime.time.min),
-        end=datetime.datetime.combine(query_date, datetime.time.max),
-        event=True, expand=True
+    events = fetch_events(
+        datetime.datetime.combine(query_date, datetime.time.min),
+        datetime.datetime.combine(query_date + datetime.timedelta(days=1), datetime.time.min)
     )
     
     if not events:
         return "No existing appointments. The doctor is available all day."
     
-    result = []
-    for event in events:
-        c = event.icalendar_component
-        uid = c.get('uid')
-        summary = c.get('summary')
-        
-        dtstart = c.get('dtstart')
-        dtend = c.get('dtend')
-        
-        if dtstart:
-            if isinstance(dtstart.dt, datetime.datetime):
-                start = dtstart.dt.strftime('%H:%M')
-            else:
-                start = "All Day"
-        else:
-            start = "Unknown"
-            
-        if dtend:
-            if isinstance(dtend.dt, datetime.datetime):
-                end = dtend.dt.strftime('%H:%M')
-            else:
-                end = "All Day"
-        else:
-            end = "Unknown"
-            
-        result.append(f"- {summary}: {start} to {end}")
-        
+    result = [f"- {event['summary']}: {event['start_label']} to {event['end_label']}" for event in events]
     return "Existing appointments (Doctor is busy during these times):\n" + "\n".join(result)
 
+#Per-day busy/free summary for a date range, fetched with one search instead of one per day
+def check_availability_range(start_date: str, end_date: str) -> str:
+    if not start_date or not end_date:
+        return "Error: start_date and end_date are required."
+
+    try:
+        first_day = _parse_date(start_date)
+        last_day = _parse_date(end_date)
+    except ValueError:
+        return "Invalid date format. Please use YYYY-MM-DD."
+
+    if last_day < first_day:
+        return "Error: End date is before start date."
+    last_day = min(last_day, first_day + datetime.timedelta(days=MAX_SLOT_SEARCH_DAYS - 1))
+
+    events = fetch_events(
+        datetime.datetime.combine(first_day, datetime.time.min),
+        datetime.datetime.combine(last_day + datetime.timedelta(days=1), datetime.time.min)
+    )
+
+    result = []
+    for day, day_events in group_by_day(events, first_day, last_day, CALENDAR_TZ).items():
+        label = f"{day.strftime('%A')} {day.isoformat()}"
+        if not day_events:
+            result.append(f"- {label}: free all day")
+            continue
+
+        busy = ", ".join(f"{e['start_label']}-{e['end_label']}" if not e["all_day"] else "All Day" for e in day_events)
+        free = [
+            f"{start.strftime('%H:%M')}-{end.strftime('%H:%M')}"
+            for _, windows in open_slots(BusyIntervals.from_events(day_events), WORKING_HOURS, day, day,
+                                         datetime.timedelta(minutes=1), CALENDAR_TZ)
+            for start, end in windows
+        ]
+        line = f"- {label}: busy {busy}"
+        if day.weekday() in WORKING_HOURS.weekdays:
+            line += f"; free {', '.join(free)}" if free else "; no free time in working hours"
+        result.append(line)
+
+    return f"Availability from {first_day} to {last_day}:\n" + "\n".join(result)
+
+#Open slots of at least duration_minutes within working hours, from start_date through end_date (default: same day)
+def find_open_slots(start_date: str, end_date: str = None, duration_minutes: int = 30) -> str:
+    if not start_date:
+        return "Error: Start date is required."
+
+    try:
+        first_day = _parse_date(start_date)
+        last_day = _parse_date(end_date) if end_date else first_day
+    except ValueError:
+        return "Invalid date format. Please use YYYY-MM-DD."
+
+    try:
+        duration = datetime.timedelta(minutes=int(duration_minutes or 30))
+    except (TypeError, ValueError):
+        return "Error: duration_minutes must be a number."
+    if duration <= datetime.timedelta(0):
+        return "Error: duration_minutes must be positive."
+
+    if last_day < first_day:
+        return "Error: End date is before start date."
+    last_day = min(last_day, first_day + datetime.timedelta(days=MAX_SLOT_SEARCH_DAYS - 1))
+
+    now = datetime.datetime.now(CALENDAR_TZ)
+    step = SLOT_STEP_MINUTES * 60
+    not_before = datetime.datetime.fromtimestamp(-(-now.timestamp() // step) * step, CALENDAR_TZ)
+
+    # One fetch for the whole range, then all the slot math is local
+    events = fetch_events(
+        datetime.datetime.combine(first_day, datetime.time.min),
+        datetime.datetime.combine(last_day + datetime.timedelta(days=1), datetime.time.min)
+    )
+    busy = BusyIntervals.from_events(events)
+    days = open_slots(busy, WORKING_HOURS, first_day, last_day, duration, CALENDAR_TZ, not_before=not_before)
+
+    if not days:
+        return f"No open slots of {int(duration.total_seconds() // 60)} minutes between {first_day} and {last_day}."
+
+    result = []
+    for day, windows in days:
+        times = ", ".join(f"{start.strftime('%H:%M')}-{end.strftime('%H:%M')}" for start, end in windows)
+        result.append(f"- {day.strftime('%A')} {day.isoformat()}: {times}")
+    return f"Open slots (at least {int(duration.total_seconds() // 60)} minutes, any start time inside a window):\n" + "\n".join(result)
+
 #Creates new event in cal
 def book_appointment(patient_name:str, start_time:str, end_time:str)->str:
     if not patient_name or not start_time or not end_time:
         return "Error: Missing required fields (patient_name, start_time, end_time)."
 
-    calendar = get_calendar()
     try:
         start_dt = datetime.datetime.fromisoformat(start_time)
         end_dt = datetime.datetime.fromisoformat(end_time)
     except ValueError:
         return "Error: Invalid time format. Use ISO 8601."
     
+    start = to_datetime(start_dt, CALENDAR_TZ)
+    end = to_datetime(end_dt, CALENDAR_TZ)
+    if end <= start:
+        return "Error: end_time must be after start_time."
+
+    # Overlap check: the mirror as it is (reconcile keeps it current in the background) + bookings this
+    # server made that it may not show yet. One search only when the mirror can't answer for the slot
+    try:
+        if CALENDAR_MIRROR and event_mirror.covers(start, end):
+            busy = event_mirror.events_between(start, end)
+        else:
+            busy = _search_events(start, end)
+    except Exception as e:
+        print(f"Error checking the slot before booking: {e}")
+        return f"Error booking appointment: {str(e)}"
     try:
-        event = calendar.save_event(
+        booking_id = booking_ledger.reserve(start, end, f"Appointment: {patient_name}", busy)
+    except BookingConflict as conflict:
+        taken = conflict.event
+        return (f"That time is not available, it overlaps an existing appointment "
+                f"({taken['start_label']} to {taken['end_label']}). Please choose another time.")
+
+    try:
+        event = with_calendar(lambda calendar: calendar.save_event(
             dtstart = start_dt, dtend = end_dt,
             summary=f"Appointment: {patient_name}"
-        )
-        uid = event.icalendar_component.get('uid')
-        return f"Booked for {patient_name}. ID: {uid}"
+        ))
     except Exception as e:
+        booking_ledger.release(booking_id)
         print(f"Error booking appointment: {e}")
-        return f"Error booking appointment: {str(e)}"
\ No newline at end of file
+        return f"Error booking appointment: {str(e)}"
+
+    uid = event.icalendar_component.get('uid')
+    booking_ledger.confirm(booking_id, str(uid))
+    event_mirror.mark_stale() #pick up the new event on the next availability check
+    _schedule_reconcile()
+    return f"Booked for {patient_name}. ID: {uid}"
+
+#Syncs the mirror and drops ledger entries the calendar now shows. Runs off the request path, one at a time
+_reconcile_lock = threading.Lock()
+
+def reconcile_bookings():
+    if not _reconcile_lock.acquire(blocking=False):
+        return #a reconcile is already running and will see this booking too
+    try:
+        event_mirror.sync()
+        for booking, other in booking_ledger.reconcile(event_mirror.events_between):
+            print(f"Warning: {booking['summary']} at {booking['start']} overlaps {other['summary']} added outside this server")
+    except Exception as e:
+        print(f"Booking reconcile failed, will retry after the next booking: {e}")
+    finally:
+        _reconcile_lock.release()
+
+def _schedule_reconcile():
+    if CALENDAR_MIRROR:
+        _executor.submit(reconcile_bookings)
+    else:
+        booking_ledger.expire() #no mirror to reconcile against, just drop entries past hold_seconds
+
+# Async interface for the webhook: caldav is blocking, so calls run on a bounded thread pool.
+# Each calendar gets its own semaphore so a slow calendar can't take every worker thread,
+# and every call is capped at CALDAV_TIMEOUT so a hung iCloud request doesn't hold up the voice call.
+_executor = ThreadPoolExecutor(max_workers=CALDAV_MAX_WORKERS, thread_name_prefix="caldav")
+_semaphores = {}
+
+#One limit per configured calendar account, the same before and after calendar discovery
+def _calendar_semaphore() -> asyncio.Semaphore:
+    key = (CALDAV_URL, ICLOUD_USERNAME)
+    if key not in _semaphores:
+        _semaphores[key] = asyncio.Semaphore(CALDAV_CALENDAR_CONCURRENCY)
+    return _semaphores[key]
+
+TIMEOUT_MESSAGE = "Error: The calendar is not responding right now. Please try again in a moment."
+
+#Runs fn on the CalDAV pool. The permit is held until the thread really finishes, not just until we stop
+#waiting, so calls that hang past the timeout still count against the limit instead of piling up
+async def run_calendar_call(fn, *args, timeout: float = None, timeout_message: str = TIMEOUT_MESSAGE):
+    loop = asyncio.get_running_loop()
+    timeout = timeout or CALDAV_TIMEOUT
+    deadline = loop.time() + timeout #waiting for a permit counts against the same timeout
+    semaphore = _calendar_semaphore()
+    try:
+        await asyncio.wait_for(semaphore.acquire(), timeout=timeout)
+    except asyncio.TimeoutError:
+        print(f"Calendar call {fn.__name__} timed out after {timeout}s waiting for a free connection")
+        return timeout_message
+    try:
+        future = loop.run_in_executor(_executor, functools.partial(fn, *args))
+    except BaseException:
+        semaphore.release()
+        raise
+    future.add_done_callback(lambda _: semaphore.release())
+    try:
+        # shield: a timeout (or a cancelled request) must not mark the future done while the thread runs
+        return await asyncio.wait_for(asyncio.shield(future), timeout=max(deadline - loop.time(), 0))
+    except asyncio.TimeoutError:
+        print(f"Calendar call {fn.__name__} timed out after {timeout}s")
+        return timeout_message
+
+async def check_availability_async(date: str) -> str:
+    return await run_calendar_call(check_availability, date)
+
+async def check_availability_range_async(start_date: str, end_date: str) -> str:
+    return await run_calendar_call(check_availability_range, start_date, end_date)
+
+async def find_open_slots_async(start_date: str, end_date: str = None, duration_minutes: int = 30) -> str:
+    return await run_calendar_call(find_open_slots, start_date, end_date, duration_minutes)
+
+async def book_appointment_async(patient_name: str, start_time: str, end_time: str) -> str:
+    # The write may still land after we stop waiting, so don't tell the caller it failed
+    return await run_calendar_call(
+        book_appointment, patient_name, start_time, end_time,
+        timeout_message="The calendar is slow to confirm this booking. Check availability for that time before booking again."
+    )
+
+def shutdown():
+    _executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,166 @@
+#Local copy of the selected calendar's events, kept current with CalDAV sync-collection.
+#The first sync downloads every event once, after that each sync only asks the server what changed
+#since the last sync token (servers without sync support fall back to a ctag/etag comparison in caldav).
+#Recurring events are expanded locally over a rolling window and kept as a sorted interval list,
+#so availability queries are answered from memory instead of a full calendar.search() per date.
+import bisect
+import datetime
+import threading
+import time
+
+import recurring_ical_events
+
+
+#Ex: naive 2026-01-05 09:00 -> 09:00 in the calendar's timezone, 2026-01-07 (all day) -> midnight.
+#Aware values are converted to tz, so .date() is always the calendar day (ex: 01:00Z -> the evening before in Chicago)
+def to_datetime(value, tz) -> datetime.datetime:
+    if isinstance(value, datetime.datetime):
+        return value.astimezone(tz) if value.tzinfo else value.replace(tzinfo=tz)
+    return datetime.datetime.combine(value, datetime.time.min, tzinfo=tz)
+
+#Label used in the availability text, "%H:%M" in the calendar's timezone for timed events (same clock
+#as the free windows, whatever zone the event was written in), "All Day" for dates
+def _label(prop, value) -> str:
+    if not prop or value is None:
+        return "Unknown"
+    if isinstance(prop.dt, datetime.datetime):
+        return value.strftime('%H:%M')
+    return "All Day"
+
+#One expanded event occurrence -> plain dict with comparable start/end
+def event_record(component, tz) -> dict:
+    dtstart = component.get('dtstart')
+    dtend = component.get('dtend')
+    start = to_datetime(dtstart.dt, tz) if dtstart else None
+    end = to_datetime(dtend.dt, tz) if dtend else start
+    if start is not None and component.get('duration') and not dtend:
+        end = start + component.get('duration').dt
+    return {
+        "uid": str(component.get('uid', "")),
+        "summary": component.get('summary'),
+        "start": start,
+        "end": end,
+        "start_label": _label(dtstart, start),
+        "end_label": _label(dtend or dtstart, end) if dtend or component.get('duration') else "Unknown",
+        "all_day": bool(dtstart) and not isinstance(dtstart.dt, datetime.datetime)
+    }
+
+
+class EventMirror:
+    def __init__(self, calendar_getter, tz, window_days:int=60, sync_interval:float=10.0):
+        self._calendar_getter = calendar_getter #returns the current caldav Calendar
+        self.tz = tz
+        self.window_days = window_days
+        self.sync_interval = sync_interval
+
+        self._sync_lock = threading.Lock()
+        self._collection = None #caldav SynchronizableCalendarObjectCollection, holds the sync token
+        self._calendar_url = None
+        self._objects = {} #object url -> icalendar.Calendar
+        self._expanded = {} #object url -> [event records inside the window]
+        self._window = (None, None)
+        self._last_sync = 0.0
+        # (starts, records, longest event) swapped as one tuple so readers never see half an update
+        self._intervals = ([], [], datetime.timedelta(0))
+
+    @property
+    def loaded(self) -> bool:
+        return self._collection is not None
+
+    @property
+    def window(self):
+        return self._window
+
+    def _current_window(self):
+        today = datetime.datetime.now(self.tz).date()
+        start = today - datetime.timedelta(days=1)
+        end = today + datetime.timedelta(days=self.window_days + 1)
+        return to_datetime(start, self.tz), to_datetime(end, self.tz)
+
+    def _expand(self, ical) -> list:
+        window_start, window_end = self._window
+        records = []
+        try:
+            for component in recurring_ical_events.of(ical).between(window_start, window_end):
+                record = event_record(component, self.tz)
+                if record["start"] is not None:
+                    records.append(record)
+        except Exception as e:
+            print(f"Warning: could not expand calendar object: {e}")
+        return records
+
+    def _rebuild(self):
+        entries = sorted(
+            (record for records in self._expanded.values() for record in records),
+            key=lambda r: r["start"]
+        )
+        longest = max((r["end"] - r["start"] for r in entries), default=datetime.timedelta(0))
+        self._intervals = ([r["start"] for r in entries], entries, longest)
+
+    def _full_sync(self, calendar):
+        collection = calendar.objects_by_sync_token(load_objects=True)
+        self._objects = {str(obj.url): obj.icalendar_instance for obj in collection.objects}
+        self._collection = collection
+        self._calendar_url = str(calendar.url)
+        self._expanded = {url: self._expand(ical) for url, ical in self._objects.items()}
+        print(f"Calendar mirror loaded {len(self._objects)} objects")
+
+    def _incremental_sync(self) -> bool:
+        updated, deleted = self._collection.sync()
+        for obj in deleted:
+            self._objects.pop(str(obj.url), None)
+            self._expanded.pop(str(obj.url), None)
+        for obj in updated:
+            url = str(obj.url)
+            self._objects[url] = obj.icalendar_instance
+            self._expanded[url] = self._expand(self._objects[url])
+        return bool(updated or deleted)
+
+    #Pulls changes from the server, full download on first use, if the calendar changed or if sync fails
+    def sync(self):
+        with self._sync_lock:
+            calendar = self._calendar_getter()
+            window = self._current_window()
+            window_moved = window != self._window
+            self._window = window
+
+            if self._collection is None or self._calendar_url != str(calendar.url):
+                self._full_sync(calendar)
+            else:
+                try:
+                    self._incremental_sync()
+                except Exception as e:
+                    print(f"Incremental calendar sync failed ({e}), doing a full sync")
+                    self._full_sync(calendar)
+                if window_moved:
+                    # New day: every object, changed or not, needs its occurrences for the shifted window
+                    self._expanded = {url: self._expand(ical) for url, ical in self._objects.items()}
+            self._rebuild()
+            self._last_sync = time.monotonic()
+
+    #Syncs only if the last sync is older than sync_interval
+    def refresh_if_stale(self):
+        if time.monotonic() - self._last_sync >= self.sync_interval:
+            with self._sync_lock:
+                fresh = time.monotonic() - self._last_sync < self.sync_interval #another thread just synced
+            if not fresh:
+                self.sync()
+
+    #Forces the next query to sync first, ex: right after we wrote an event ourselves
+    def mark_stale(self):
+        self._last_sync = 0.0
+
+    def covers(self, start:datetime.datetime, end:datetime.datetime) -> bool:
+        window_start, window_end = self._window
+        if not self.loaded or window_start is None:
+            return False
+        return window_start <= to_datetime(start, self.tz) and to_datetime(end, self.tz) <= window_end
+
+    #Events overlapping [start, end), sorted by start time
+    def events_between(self, start:datetime.datetime, end:datetime.datetime) -> list:
+        start = to_datetime(start, self.tz)
+        end = to_datetime(end, self.tz)
+        starts, entries, longest = self._intervals
+        lo = bisect.bisect_left(starts, start - longest)
+        hi = bisect.bisect_left(starts, end)
+        return [r for r in entries[lo:hi] if r["end"] > start or r["start"] >= start]
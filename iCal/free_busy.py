@@ -0,0 +1,125 @@
+#Free/busy engine for slot search.
+#Busy events are merged into a sorted list of non-overlapping intervals once, then every working
+#period in the requested range is swept against that list to find gaps long enough for an appointment.
+import bisect
+import datetime
+
+
+#Ex: "09:00" -> time(9, 0)
+def parse_clock(value:str) -> datetime.time:
+    return datetime.datetime.strptime(value.strip(), "%H:%M").time()
+
+#Ex: "0-4" -> {0,1,2,3,4} (Mon-Fri), "0,2,4" -> {0,2,4}
+def parse_weekdays(value:str) -> frozenset:
+    days = set()
+    for part in value.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            first, last = part.split("-", 1)
+            days.update(range(int(first), int(last) + 1))
+        else:
+            days.add(int(part))
+    return frozenset(d for d in days if 0 <= d <= 6)
+
+
+class WorkingHours:
+    def __init__(self, start:datetime.time, end:datetime.time, weekdays=frozenset(range(5))):
+        if end <= start:
+            raise ValueError("Working hours must end after they start")
+        self.start = start
+        self.end = end
+        self.weekdays = frozenset(weekdays)
+
+    @classmethod
+    def from_strings(cls, start:str, end:str, weekdays:str):
+        return cls(parse_clock(start), parse_clock(end), parse_weekdays(weekdays))
+
+    #Yields (day, open, close) for each working day in [start_date, end_date]
+    def periods(self, start_date:datetime.date, end_date:datetime.date, tz):
+        day = start_date
+        while day <= end_date:
+            if day.weekday() in self.weekdays:
+                yield (
+                    day,
+                    datetime.datetime.combine(day, self.start, tzinfo=tz),
+                    datetime.datetime.combine(day, self.end, tzinfo=tz)
+                )
+            day += datetime.timedelta(days=1)
+
+
+class BusyIntervals:
+    def __init__(self, intervals):
+        # Sort by start and merge overlapping/touching intervals -> disjoint, sorted by start and end
+        merged = []
+        for start, end in sorted(i for i in intervals if i[1] > i[0]):
+            if merged and start <= merged[-1][1]:
+                if end > merged[-1][1]:
+                    merged[-1][1] = end
+            else:
+                merged.append([start, end])
+        self._starts = [i[0] for i in merged]
+        self._ends = [i[1] for i in merged]
+
+    @classmethod
+    def from_events(cls, events:list):
+        return cls((e["start"], e["end"]) for e in events if e.get("start") and e.get("end"))
+
+    def __len__(self):
+        return len(self._starts)
+
+    def is_free(self, start:datetime.datetime, end:datetime.datetime) -> bool:
+        # Intervals are disjoint, so only the first one ending after start can overlap
+        i = bisect.bisect_right(self._ends, start)
+        return i == len(self._starts) or self._starts[i] >= end
+
+    #Gaps of at least min_length inside [start, end)
+    def gaps(self, start:datetime.datetime, end:datetime.datetime, min_length:datetime.timedelta) -> list:
+        result = []
+        cursor = start
+        i = bisect.bisect_right(self._ends, start)
+        while i < len(self._starts) and self._starts[i] < end:
+            if self._starts[i] - cursor >= min_length:
+                result.append((cursor, self._starts[i]))
+            cursor = max(cursor, self._ends[i])
+            i += 1
+        if end - cursor >= min_length:
+            result.append((cursor, end))
+        return result
+
+
+#Ex: {date: [events overlapping that day], ...} for every day in [start_date, end_date], multi-day events land on each day
+def group_by_day(events:list, start_date:datetime.date, end_date:datetime.date, tz) -> dict:
+    days = {}
+    day = start_date
+    while day <= end_date:
+        days[day] = []
+        day += datetime.timedelta(days=1)
+
+    for event in sorted(events, key=lambda e: e["start"]):
+        day = max(event["start"].astimezone(tz).date(), start_date)
+        last = event["end"].astimezone(tz)
+        # An event ending exactly at midnight doesn't occupy the next day
+        last_day = (last - datetime.timedelta(microseconds=1)).date() if last > event["start"] else last.date()
+        while day <= min(last_day, end_date):
+            days[day].append(event)
+            day += datetime.timedelta(days=1)
+    return days
+
+#Open windows of at least `duration` per working day, ex: [(date, [(start, end), ...]), ...]
+#Days without any opening are left out, `not_before` skips time that already passed
+def open_slots(busy:BusyIntervals, hours:WorkingHours, start_date:datetime.date, end_date:datetime.date,
+               duration:datetime.timedelta, tz, not_before:datetime.datetime=None, max_days:int=None) -> list:
+    result = []
+    for day, open_at, close_at in hours.periods(start_date, end_date, tz):
+        if not_before is not None:
+            open_at = max(open_at, not_before)
+        if close_at - open_at < duration:
+            continue
+        gaps = busy.gaps(open_at, close_at, duration)
+        if gaps:
+            result.append((day, gaps))
+            if max_days and len(result) >= max_days:
+                break
+    return result
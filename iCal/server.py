@@ -1,8 +1,16 @@
 import uvicorn
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
-from cal_service import check_availability, book_appointment
+from cal_service import (
+    check_availability_async, check_availability_range_async, book_appointment_async, find_open_slots_async, shutdown
+)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    shutdown()
+
+app = FastAPI(lifespan=lifespan)
 
 @app.post('/webhook')
 async def handle_retell_webhook(request:Request):
@@ -12,10 +20,15 @@ async def handle_retell_webhook(request:Request):
     
     result = None
     
+    # Calendar calls run on the cal_service thread pool, the event loop stays free for other calls
     if tool_name == 'check_availability':
-        result = check_availability(args.get("date"))
+        result = await check_availability_async(args.get("date"))
+    elif tool_name == 'check_availability_range':
+        result = await check_availability_range_async(args.get("start_date"), args.get("end_date"))
     elif tool_name == "book_appointment":
-        result = book_appointment(args.get("patient_name"), args.get("start_time"), args.get("end_time"))
+        result = await book_appointment_async(args.get("patient_name"), args.get("start_time"), args.get("end_time"))
+    elif tool_name == "find_open_slots":
+        result = await find_open_slots_async(args.get("start_date"), args.get("end_date"), args.get("duration_minutes", 30))
         
     response = {"result":result}
     if "response_id" in data:
@@ -24,4 +37,4 @@ async def handle_retell_webhook(request:Request):
     return response
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000)